@@ -1,44 +1,28 @@
-from typing import Dict, Any, List
+from typing import Dict, Any
 from langsmith import traceable
-from config import get_brands
-
-
-@traceable(run_type="tool", name="tag_brands")
-def _tag_brands(text: str, brands: List[str]) -> List[str]:
-    """
-    Check which brands are mentioned in text (case-insensitive).
-    """
-    text_lower = text.lower()
-    matches = []
-    for brand in brands:
-        if brand.lower() in text_lower:
-            matches.append(brand)
-    return matches
+from services.brand_catalog import get_brand_catalog
+from services.post_table import PostTable
 
 
 @traceable(run_type="chain", name="brand_tagging")
 def brand_tagging_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Node 4: Scan posts and tag them with mentioned brands.
+    Builds the columnar post table that downstream nodes reduce over.
     """
     posts = state.get("clean_data", [])
-    tagged_posts = []
-
-    brands = get_brands()
-    mention_counters = {brand: 0 for brand in brands}
+    tagged_posts = list(posts)
 
-    for post in posts:
-        mentions = _tag_brands(post["text"], brands)
-        if mentions:
-            post["brands"] = mentions
-            for b in mentions:
-                mention_counters[b] += 1
-        else:
-            post["brands"] = ["none"]
+    catalog = get_brand_catalog()
+    table = PostTable(tagged_posts, catalog.brands)
 
-        tagged_posts.append(post)
+    for row, post in enumerate(tagged_posts):
+        mentions = catalog.find(post["text"])
+        post["brands"] = mentions or ["none"]
+        table.set_brands(row, mentions)
 
     state["tagged_data"] = tagged_posts
-    state["mention_counters"] = mention_counters
+    state["post_table"] = table
+    state["mention_counters"] = table.mention_counters()
 
     return state
@@ -1,30 +1,143 @@
+import asyncio
+import math
 import os
+import time
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Dict, Any, List, Awaitable, Callable
 
 from services.google_fetcher import fetch_google_serpapi
-from services.youtube_fetcher import fetch_youtube
+from services.youtube_fetcher import fetch_youtube, quota_scope
+from services.progress import emit, source_view
+from services.budget import keyword_scope
 from langsmith import traceable
-from config import get_keywords
+from config import get_keywords, get_source_timeout, get_provider_concurrency, get_youtube_settings, get_google_settings
 
 
-@traceable(run_type="tool", name="data_retrieval")
-def data_retrieval_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    """LangGraph node: fetches data from Google, YouTube, X"""
-    keyword = state.get("keywords", get_keywords())[0]
-    top_n = state.get("top_n_per_platform", 20)
+async def _timed_fetch(
+    fetch: Callable[[], Awaitable[List[Dict[str, Any]]]],
+    semaphore: asyncio.Semaphore,
+    source: str,
+    keyword: str,
+) -> Dict[str, Any]:
+    """
+    Run a single source fetch once its provider has a free slot and record
+    its wall time and outcome. Fetched posts are streamed right away and
+    the fetch's quota usage is attributed to `keyword`.
+    """
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            with keyword_scope(keyword):
+                posts = await fetch()
+            outcome = {"posts": posts, "status": "ok"}
+            emit({
+                "type": "posts",
+                "source": source,
+                "keyword": keyword,
+                "posts": [source_view(p) for p in outcome["posts"]],
+            })
+        except Exception as e:
+            outcome = {"posts": [], "status": "error", "error": str(e)}
+    outcome["finished"] = time.perf_counter()
+    outcome["seconds"] = outcome["finished"] - start
+    return outcome
+
+
+async def _fetch_sources(
+    sources: Dict[str, Callable[[str], Awaitable[List[Dict[str, Any]]]]],
+    keywords: List[str],
+    timeout: float,
+    concurrency: int,
+) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Fan every keyword out to every source concurrently. Each source gets
+    its own semaphore so at most `concurrency` requests are in flight per
+    provider. A (source, keyword) fetch that errors or misses the deadline
+    contributes no posts but never delays or sinks the others.
+
+    Returns {source: {keyword: outcome}}; timed-out outcomes carry no
+    "finished" timestamp.
+    """
+    # Each keyword may wait behind others in its provider's pool.
+    deadline = timeout * math.ceil(len(keywords) / concurrency)
+
+    tasks = {}
+    for name, fetch in sources.items():
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks[name] = {
+            kw: asyncio.ensure_future(_timed_fetch(lambda f=fetch, k=kw: f(k), semaphore, name, kw))
+            for kw in keywords
+        }
+
+    all_tasks = [t for per_kw in tasks.values() for t in per_kw.values()]
+    if all_tasks:
+        await asyncio.wait(all_tasks, timeout=deadline)
+    # Don't wait for stragglers; their results are simply discarded.
+    for task in all_tasks:
+        if not task.done():
+            task.cancel()
+
+    outcomes = {}
+    for name, per_kw in tasks.items():
+        outcomes[name] = {}
+        for kw, task in per_kw.items():
+            if task.done() and not task.cancelled():
+                outcomes[name][kw] = task.result()
+            else:
+                outcomes[name][kw] = {
+                    "posts": [],
+                    "status": "timeout",
+                    "error": f"exceeded {deadline:.0f}s",
+                    "seconds": deadline,
+                }
+    return outcomes
+
 
-    combined = []
+def _post_key(post: Dict[str, Any]) -> str:
+    meta = post.get("meta", {})
+    return meta.get("url") or f"{post.get('platform')}:{post['text'].strip().lower()}"
 
-    try:
-        combined.extend(fetch_google_serpapi(keyword, top_n=top_n))
-    except Exception as e:
-        print("Google fetch error:", e)
 
-    try:
-        combined.extend(fetch_youtube(keyword, top_n_videos=top_n))
-    except Exception as e:
-        print("YouTube fetch error:", e)
+def _merge_posts(
+    outcomes: Dict[str, Dict[str, Dict[str, Any]]]
+) -> List[Dict[str, Any]]:
+    """
+    Merge all (source, keyword) results into one stream. A post found by
+    several keywords appears once with every matching keyword in
+    meta["keywords"].
+    """
+    merged = {}
+    for per_kw in outcomes.values():
+        for kw, outcome in per_kw.items():
+            for post in outcome["posts"]:
+                key = _post_key(post)
+                if key in merged:
+                    found_by = merged[key]["meta"]["keywords"]
+                    if kw not in found_by:
+                        found_by.append(kw)
+                else:
+                    post.setdefault("meta", {})["keywords"] = [kw]
+                    merged[key] = post
+    return list(merged.values())
+
+
+@traceable(run_type="tool", name="data_retrieval")
+async def data_retrieval_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """LangGraph node: fetches data for every keyword from Google, YouTube, X concurrently"""
+    keywords = list(dict.fromkeys(state.get("keywords") or get_keywords()))
+    top_n = state.get("top_n_per_platform", 20)
+    youtube_settings = get_youtube_settings()
+    google_settings = get_google_settings()
+
+    sources = {
+        "Google": lambda kw: fetch_google_serpapi(
+            kw,
+            top_n=top_n,
+            pages=google_settings["pages"],
+            verticals=tuple(google_settings["verticals"]),
+        ),
+        "YouTube": lambda kw: fetch_youtube(kw, top_n_videos=top_n, deep=youtube_settings["deep"]),
+    }
 
     enable_x = str(os.getenv("ENABLE_X") or state.get("ENABLE_X", "")).lower() in (
         "1",
@@ -33,16 +146,45 @@ def data_retrieval_node(state: Dict[str, Any]) -> Dict[str, Any]:
         "on",
     )
     if enable_x:
-        try:
-            since_date = (datetime.utcnow() - timedelta(days=365)).date().isoformat()
-            until_date = datetime.utcnow().date().isoformat()
-            combined.extend(
-                fetch_x_snscrape(
-                    keyword, top_n=top_n, since_iso=since_date, until_iso=until_date
-                )
-            )
-        except Exception as e:
-            print("X fetch error:", e)
+        since_date = (datetime.utcnow() - timedelta(days=365)).date().isoformat()
+        until_date = datetime.utcnow().date().isoformat()
+        sources["X"] = lambda kw: fetch_x_snscrape(
+            kw, top_n=top_n, since_iso=since_date, until_iso=until_date
+        )
+
+    start = time.perf_counter()
+    # One YouTube quota tally shared by every keyword of this run
+    with quota_scope() as youtube_quota:
+        outcomes = await _fetch_sources(
+            sources,
+            keywords,
+            timeout=get_source_timeout(),
+            concurrency=get_provider_concurrency(),
+        )
+
+    source_timings = {}
+    for name, per_kw in outcomes.items():
+        failed = {}
+        for kw, outcome in per_kw.items():
+            if outcome["status"] != "ok":
+                print(f"{name} fetch {outcome['status']} for '{kw}': {outcome.get('error')}")
+                failed[kw] = outcome["status"]
+
+        if len(failed) == len(per_kw):
+            status = "timeout" if "timeout" in failed.values() else "error"
+        else:
+            status = "partial" if failed else "ok"
+        source_timings[name] = {
+            "status": status,
+            "seconds": round(
+                max(o["finished"] - start if "finished" in o else o["seconds"] for o in per_kw.values()),
+                3,
+            ),
+            "count": sum(len(o["posts"]) for o in per_kw.values()),
+            "failed_keywords": failed,
+        }
 
-    state["raw_data"] = combined
+    state["raw_data"] = _merge_posts(outcomes)
+    state["source_timings"] = source_timings
+    state["youtube_quota"] = youtube_quota.summary()
     return state
@@ -0,0 +1,57 @@
+from typing import Dict, Any
+
+import orjson
+import xxhash
+from langsmith import traceable
+
+from agent.nodes.noise_filtering import PROMPT_VERSION
+from services.brand_catalog import get_brand_catalog
+from services.post_store import content_hash, get_post_store, post_key
+
+
+def incremental_scope(keywords, catalog) -> str:
+    """Processed results are only reusable for the same keywords, brands and prompt."""
+    return xxhash.xxh3_64_hexdigest(
+        orjson.dumps([sorted(keywords), catalog.entries, PROMPT_VERSION])
+    )
+
+
+@traceable(run_type="chain", name="delta_detection")
+def delta_detection_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Incremental mode: split fetched posts into ones already processed in a
+    previous run (same stable id and text) and new or changed ones. Only
+    the latter are passed on as raw_data to the expensive nodes.
+    """
+    keywords = state.get("keywords", [])
+    scope = incremental_scope(keywords, get_brand_catalog())
+
+    fetched = {}
+    for post in state.get("raw_data", []):
+        fetched.setdefault(post_key(post), post)
+
+    previous = get_post_store().get_posts(scope, list(fetched))
+
+    delta, carried = [], {}
+    for post_id, post in fetched.items():
+        stored = previous.get(post_id)
+        # Provisional records were labelled by the keyword fallback; classify them again
+        if stored and stored["content_hash"] == content_hash(post) and not stored["record"].get("provisional"):
+            carried[post_id] = post
+        else:
+            delta.append(post)
+
+    state["incremental"] = {
+        "scope": scope,
+        "all_raw_data": state.get("raw_data", []),
+        "previous": {post_id: stored["record"] for post_id, stored in previous.items()},
+        "carried": carried,
+    }
+    state["incremental_stats"] = {
+        "fetched": len(fetched),
+        "new": sum(1 for post_id, _ in fetched.items() if post_id not in previous),
+        "changed": sum(1 for post in delta if post_key(post) in previous),
+        "unchanged": len(carried),
+    }
+    state["raw_data"] = delta
+    return state
@@ -1,35 +1,16 @@
-from typing import Dict, Any, DefaultDict
-from collections import defaultdict
+from typing import Dict, Any
 from langsmith import traceable
-from config import get_brands
+from services.brand_catalog import get_brand_catalog
+from services.post_table import PostTable
 
 
 @traceable(run_type="chain", name="engagement_aggregation")
 def engagement_aggregation_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Node 5: Aggregate engagement metrics for each brand.
+    One brand-mask x engagement matrix product over the post table.
     """
-    tagged_posts = state.get("tagged_data", [])
-
-    engagement_totals = {
-        brand: {"likes": 0, "comments": 0, "views": 0, "shares": 0} for brand in get_brands()
-    }
-
-    for post in tagged_posts:
-        brands = post.get("brands", [])
-        meta = post.get("meta", {})
-
-        likes = meta.get("likes", 0)
-        comments = meta.get("comments", 0)
-        views = meta.get("views", 0)
-        shares = meta.get("shares", 0)
-
-        for brand in brands:
-            if brand in engagement_totals:
-                engagement_totals[brand]["likes"] += likes
-                engagement_totals[brand]["comments"] += comments
-                engagement_totals[brand]["views"] += views
-                engagement_totals[brand]["shares"] += shares
-
-    state["engagement_totals"] = engagement_totals
+    table = PostTable.from_state(state, get_brand_catalog().brands)
+    state["post_table"] = table
+    state["engagement_totals"] = table.engagement_dict()
     return state
@@ -0,0 +1,85 @@
+import asyncio
+from typing import Dict, Any
+
+from langsmith import traceable
+
+from config import get_breakdown_settings
+from agent.nodes.delta_detection import incremental_scope
+from services.brand_catalog import get_brand_catalog
+from services.metrics_engine import group_counts, metrics_from_counts
+from services.post_store import get_post_store
+from services.post_table import PostTable, ENGAGEMENT_FIELDS
+from services.youtube_fetcher import fetch_video_stats, quota_scope
+
+
+def _recompute(store, scope: str, stats: Dict[str, Dict[str, Any]], brands):
+    """
+    Apply fresh video statistics to the stored posts and recompute counts
+    over the clean ones, reading and writing in one store transaction.
+    Returns the changed records, engagement totals and metrics.
+    """
+    result = {}
+
+    def merge(records, _counts):
+        updated = {}
+        for post_id, record in records.items():
+            meta = record.get("meta", {})
+            is_video = record.get("platform") == "YouTube" and meta.get("kind") != "comment"
+            engagement = stats.get(meta.get("id")) if is_video else None
+            if engagement and any(meta.get(field) != engagement[field] for field in ENGAGEMENT_FIELDS):
+                updated[post_id] = records[post_id] = {**record, "meta": {**meta, **engagement}}
+        table = PostTable.from_posts([r for r in records.values() if r.get("clean")], brands)
+        result.update(updated=updated, engagement=table.engagement_dict())
+        return updated, group_counts(table)
+
+    counts = store.update(scope, None, brands, merge)
+    return result["updated"], result["engagement"], metrics_from_counts(counts, brands, get_breakdown_settings())
+
+
+@traceable(run_type="chain", name="engagement_refresh")
+async def engagement_refresh_node(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Refresh engagement of posts stored by earlier incremental runs without
+    searching, classifying or tagging again: known YouTube videos get new
+    statistics from batched videos.list calls, then engagement totals and
+    metrics are recomputed from the stored, already-tagged posts.
+    """
+    catalog = get_brand_catalog()
+    scope = incremental_scope(state.get("keywords", []), catalog)
+    store = get_post_store()
+    records = await asyncio.to_thread(store.all_posts, scope)
+
+    # Video posts only; comments and web results keep their stored numbers
+    videos = {
+        record["meta"]["id"]: post_id
+        for post_id, record in records.items()
+        if record.get("platform") == "YouTube"
+        and record.get("meta", {}).get("id")
+        and record["meta"].get("kind") != "comment"
+    }
+
+    stats = {}
+    with quota_scope() as youtube_quota:
+        if videos:
+            try:
+                stats = await fetch_video_stats(list(videos))
+            except Exception as e:
+                print(f"YouTube stats refresh failed: {e}")
+
+    updated, engagement_totals, (metrics, breakdowns) = await asyncio.to_thread(
+        _recompute, store, scope, stats, catalog.brands
+    )
+
+    state["engagement_totals"] = engagement_totals
+    state["metrics"] = metrics
+    state["metric_breakdowns"] = breakdowns
+    state["mention_counters"] = {b: m["mentions"] for b, m in metrics.items()}
+    state["sentiment_totals"] = {b: m["sentiment"] for b, m in metrics.items()}
+    state["engagement_refresh"] = {
+        "known_posts": len(records),
+        "videos": len(videos),
+        "refreshed": len(stats),
+        "changed": len(updated),
+        "youtube_quota": youtube_quota.summary(),
+    }
+    return state
@@ -1,9 +1,16 @@
+import asyncio
 from typing import Dict, Any
 import os
 from dotenv import load_dotenv
 from langsmith import traceable
 from config import get_brands
-from openai import OpenAI
+from services.resources import get_resources
+from services.budget import reserve_llm_tokens, settle_llm_tokens
+from services.tokenizer import count_tokens
+from services.instrumentation import instrumented_call
+
+# Expected length of the narrative, for reserving LLM budget before a call
+INSIGHT_REPLY_TOKENS = 400
 
 load_dotenv()
 
@@ -43,43 +50,54 @@ def _rule_based_insights(metrics: Dict[str, Any], keywords: list = None) -> Dict
     return insights
 
 
+@instrumented_call("llm", "openai_insights")
 @traceable(run_type="llm", name="call_openai")
-def _call_openai(prompt: str, api_key: str) -> str:
+async def _call_openai(prompt: str, api_key: str) -> str:
     """Call OpenAI GPT-4o-mini"""
     
-    client = OpenAI(api_key=api_key)
-    completion = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are a marketing analyst. Generate concise, actionable insights."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.4
-    )
+    client = get_resources().openai(api_key)
+    prompt_tokens = await asyncio.to_thread(count_tokens, prompt)
+    reserved = reserve_llm_tokens(prompt_tokens + INSIGHT_REPLY_TOKENS)
+    completion = None
+    try:
+        completion = await client.chat.completions.create(
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": "You are a marketing analyst. Generate concise, actionable insights."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.4
+        )
+    finally:
+        settle_llm_tokens(reserved, completion)
     return completion.choices[0].message.content.strip()
 
 
+@instrumented_call("llm", "gemini_insights")
 @traceable(run_type="llm", name="call_gemini")
-def _call_gemini(prompt: str, api_key: str) -> str:
+async def _call_gemini(prompt: str, api_key: str) -> str:
     """Call OpenAI Gemini-1.5-flash"""
     
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-    )
-    completion = client.chat.completions.create(
-        model="gemini-1.5-flash",
-        messages=[
-            {"role": "system", "content": "You are a marketing analyst. Generate concise, actionable insights."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.4
-    )
+    client = get_resources().gemini(api_key)
+    prompt_tokens = await asyncio.to_thread(count_tokens, prompt)
+    reserved = reserve_llm_tokens(prompt_tokens + INSIGHT_REPLY_TOKENS)
+    completion = None
+    try:
+        completion = await client.chat.completions.create(
+            model="gemini-1.5-flash",
+            messages=[
+                {"role": "system", "content": "You are a marketing analyst. Generate concise, actionable insights."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.4
+        )
+    finally:
+        settle_llm_tokens(reserved, completion)
     return completion.choices[0].message.content.strip()
 
 
 @traceable(run_type="chain", name="generate_llm_insights")
-def _generate_llm_insights(metrics: Dict[str, Any], rule_based: Dict[str, str], keywords: list = None) -> str:
+async def _generate_llm_insights(metrics: Dict[str, Any], rule_based: Dict[str, str], keywords: list = None) -> str:
     """Generate insights using either OpenAI or Gemini based on available API keys"""
     
     prompt = (
@@ -97,14 +115,14 @@ def _generate_llm_insights(metrics: Dict[str, Any], rule_based: Dict[str, str],
     if gemini_key:
         try:
             print("Using Gemini 2.5 Flash for insights")
-            return _call_gemini(prompt, gemini_key)
+            return await _call_gemini(prompt, gemini_key)
         except Exception as e:
             print(f"Gemini failed: {e}")
 
     elif openai_key:
         try:
             print("Using OpenAI GPT-4o-mini for insights")
-            return _call_openai(prompt, openai_key)
+            return await _call_openai(prompt, openai_key)
         except Exception as e:
             print(f"OpenAI failed: {e}")
     
@@ -115,7 +133,7 @@ def _generate_llm_insights(metrics: Dict[str, Any], rule_based: Dict[str, str],
 
 
 @traceable(run_type="chain", name="insight_generation")
-def insight_generation_node(state: Dict[str, Any]) -> Dict[str, Any]:
+async def insight_generation_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """Generate marketing insights from brand metrics"""
     metrics = state.get("metrics", {})
     keywords = state.get("keywords", [])
@@ -139,7 +157,7 @@ def insight_generation_node(state: Dict[str, Any]) -> Dict[str, Any]:
             "Please try with broader keywords or a longer time window."
         )
     
-    llm_narrative = _generate_llm_insights(metrics, rule_based, keywords)
+    llm_narrative = await _generate_llm_insights(metrics, rule_based, keywords)
     
     final_narrative = llm_narrative if llm_narrative else fallback_narrative
     
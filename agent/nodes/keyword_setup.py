@@ -1,6 +1,6 @@
 from typing import Dict, Any
 from langsmith import traceable
-from config import get_brands
+from services.brand_catalog import get_brand_catalog
 
 
 @traceable(run_type="chain", name="keyword_setup")
@@ -8,7 +8,7 @@ def keyword_setup_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Node 1: Initialize brands, mentions, engagement, and sentiment counters.
     """
-    brands = get_brands()
+    brands = get_brand_catalog().brands
 
     state["brands"] = brands
     state["mentions"] = {b: 0 for b in brands}
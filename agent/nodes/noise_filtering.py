@@ -1,8 +1,20 @@
+import asyncio
+import math
 import os
 from typing import Dict, Any, List
 from langsmith import traceable
 from dotenv import load_dotenv
-from openai import OpenAI
+
+from config import get_llm_settings, get_classify_batching, get_prefilter_settings
+from services.rate_limit import TokenBucket, call_with_retry
+from services.resources import get_resources
+from services.progress import emit
+from services.classification_cache import classification_key, get_classification_cache
+from services.brand_catalog import get_brand_catalog
+from services.budget import reserve_llm_tokens, settle_llm_tokens
+from services.instrumentation import instrumented_call, record_cache
+from services.tokenizer import count_tokens, truncate_to_tokens
+from services.relevance_model import URL_RE, get_relevance_model
 
 import json
 import re
@@ -24,13 +36,54 @@ def safe_json_parse(response: str) -> dict:
 
 load_dotenv()
 
+# Bump whenever the classification prompt or response format changes so
+# cached classifications from the old prompt are not reused.
+PROMPT_VERSION = "2"
+
+# Extra requests allowed per batch for ids the model left out
+MAX_REPAIR_ROUNDS = 2
+
+# Expected reply size per post, for reserving LLM budget before a call
+REPLY_TOKENS_PER_POST = 20
+
+
+def _validate_classifications(parsed: Any, expected_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Keep only well-formed entries for ids we asked about. Unknown ids,
+    duplicates and entries without boolean flags are discarded so a
+    sloppy reply can never land on the wrong post.
+    """
+    entries = parsed.get("results") if isinstance(parsed, dict) else parsed
+    if not isinstance(entries, list):
+        raise ValueError(f"Expected a results list, got {type(entries).__name__}")
+
+    expected = set(expected_ids)
+    valid = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        post_id = str(entry.get("id", "")).strip()
+        relevant, spam = entry.get("relevant"), entry.get("spam")
+        if post_id not in expected or post_id in valid:
+            continue
+        if not isinstance(relevant, bool) or not isinstance(spam, bool):
+            continue
+        valid[post_id] = {"relevant": relevant, "spam": spam}
+    return valid
+
+
+@instrumented_call("llm", "classify")
 @traceable(run_type="llm", name="gemini_relevance_filter")
-def llm_classify(posts: List[str], keywords: List[str]) -> List[Dict[str, Any]]:
+async def llm_classify(posts: Dict[str, str], keywords: List[str], model: str = "gemini-1.5-flash") -> Dict[str, Dict[str, Any]]:
     """
     Use Gemini to classify multiple posts as relevant and/or spam.
-    Returns a list of dicts: [{"post": str, "relevant": bool, "spam": bool}, ...]
+    Takes {id: text} and returns {id: {"relevant": bool, "spam": bool}} for
+    every id the model answered validly; missing ids are simply absent.
     """
-    posts_formatted = "\n".join([f"{i+1}. \"{p}\"" for i, p in enumerate(posts)])
+    posts_formatted = "\n".join(
+        json.dumps({"id": post_id, "text": text}, ensure_ascii=False)
+        for post_id, text in posts.items()
+    )
 
     prompt = f"""
     You are filtering posts for market research on {keywords}.
@@ -40,38 +93,186 @@ def llm_classify(posts: List[str], keywords: List[str]) -> List[Dict[str, Any]]:
 
     Keywords to consider: {", ".join(keywords)}
 
-    Posts:
+    Posts (one JSON object per line):
     {posts_formatted}
 
-    Return JSON array ONLY, in this format:
-    [
-      {{"post": "...", "relevant": true/false, "spam": true/false}},
-      ...
-    ]
+    Return a JSON object ONLY, with exactly one entry per post id, in this format:
+    {{"results": [{{"id": "<post id>", "relevant": true/false, "spam": true/false}}, ...]}}
     """
 
     api_key = os.getenv("GOOGLE_API_KEY")
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://generativelanguage.googleapis.com/v1beta/openai/"
-    )
+    # retries are handled by call_with_retry
+    client = get_resources().gemini(api_key, max_retries=0)
 
-    completion = client.chat.completions.create(
-        model="gemini-1.5-flash",
-        messages=[
-            {"role": "system", "content": "You are a strict JSON classifier. Reply only with JSON."},
-            {"role": "user", "content": prompt}
-        ]
-    )
+    # Raises BudgetExceeded, which sends the batch to the keyword fallback
+    prompt_tokens = await asyncio.to_thread(count_tokens, prompt)
+    reserved = reserve_llm_tokens(prompt_tokens + REPLY_TOKENS_PER_POST * len(posts))
+    completion = None
+    try:
+        completion = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "You are a strict JSON classifier. Reply only with JSON."},
+                {"role": "user", "content": prompt}
+            ],
+            response_format={"type": "json_object"},
+        )
+    finally:
+        settle_llm_tokens(reserved, completion)
 
     response = completion.choices[0].message.content
-    return safe_json_parse(response)
+    return _validate_classifications(safe_json_parse(response), list(posts))
+
+
+_bucket = None
+
+
+def _get_bucket(settings: Dict[str, Any]) -> TokenBucket:
+    """Shared across runs so concurrent pipelines respect one rate limit."""
+    global _bucket
+    if _bucket is None:
+        _bucket = TokenBucket(settings["requests_per_minute"] / 60, settings["burst"])
+    return _bucket
+
+
+def _fallback_classify(text: str, keywords: List[str]) -> Dict[str, Any]:
+    """
+    Degraded classification used when the LLM keeps failing: a post is
+    relevant if it mentions any keyword.
+    """
+    text_lower = text.lower()
+    return {
+        "post": text,
+        "relevant": any(kw.lower() in text_lower for kw in keywords),
+        "spam": False,
+        "degraded": True,
+    }
+
+
+async def _classify_batch(items: List[tuple], keywords: List[str], settings: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Classify (key, text) items and return {key: classification}. Ids the
+    model skips or mangles are re-requested on their own; anything still
+    unanswered after MAX_REPAIR_ROUNDS falls back to keyword matching.
+    """
+    pending = {str(i + 1): item for i, item in enumerate(items)}
+    results = {}
+
+    for _ in range(MAX_REPAIR_ROUNDS + 1):
+        try:
+            answered = await call_with_retry(
+                llm_classify,
+                {post_id: text for post_id, (_, text) in pending.items()},
+                keywords,
+                settings["classify_model"],
+                bucket=_get_bucket(settings),
+                max_retries=settings["max_retries"],
+            )
+        except ValueError as e:
+            # Unparseable reply; ask again for the same ids
+            print(f"Invalid classification response: {e}")
+            continue
+        except Exception as e:
+            print(f"Batch classification failed: {e}")
+            break
+
+        for post_id, result in answered.items():
+            key, text = pending.pop(post_id)
+            results[key] = {"post": text, **result}
+        if not pending:
+            break
+
+    if pending:
+        print(f"Using keyword fallback for {len(pending)} unclassified posts")
+        for key, text in pending.values():
+            results[key] = _fallback_classify(text, keywords)
+    return results
+
+
+# Numbering, quotes and the per-post JSON reply line
+PER_POST_OVERHEAD_TOKENS = 30
+
+
+def _pack_batches(items: List[tuple], batching: Dict[str, int]) -> List[List[tuple]]:
+    """
+    Greedily pack (key, text) items into batches that stay under the
+    per-request token budget. Texts longer than `max_post_tokens` are
+    truncated first so one long YouTube description can't overflow a batch.
+    """
+    batches = []
+    current, current_tokens = [], 0
+    for key, text in items:
+        text = truncate_to_tokens(text, batching["max_post_tokens"])
+        tokens = count_tokens(text) + PER_POST_OVERHEAD_TOKENS
+        if current and (
+            current_tokens + tokens > batching["batch_tokens"]
+            or len(current) >= batching["max_batch_posts"]
+        ):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append((key, text))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _prefilter(text: str, keywords: List[str], catalog, settings: Dict[str, Any], model) -> Dict[str, Any]:
+    """
+    Decide obvious cases locally. Returns a classification, or None when
+    the post is ambiguous and should go to the LLM. Only posts with no text
+    besides links are rejected by rule; short posts and posts without a
+    keyword match are left to the trained model or the LLM.
+    """
+    def _decide(relevant, spam, reason):
+        return {"post": text, "relevant": relevant, "spam": spam, "prefilter": reason}
+
+    if not any(c.isalnum() for c in URL_RE.sub("", text)):
+        return _decide(False, True, "empty_or_link_only")
+
+    if model is not None:
+        keep = model.predict_keep(text, keywords, catalog)
+        if keep >= settings["confidence"]:
+            return _decide(True, False, "model")
+        if keep <= 1 - settings["confidence"]:
+            return _decide(False, False, "model")
+    return None
+
+
+def _run_prefilter(pending: Dict[str, str], keywords: List[str], cache, settings: Dict[str, Any]):
+    """Local decisions for pending posts; returns ({key: decision}, model)."""
+    catalog = get_brand_catalog()
+    model = get_relevance_model(cache, catalog, settings)
+    prefiltered = {}
+    for key, text in pending.items():
+        decision = _prefilter(text, keywords, catalog, settings, model)
+        if decision is not None:
+            prefiltered[key] = decision
+    return prefiltered, model
+
+
+def _emit_classifications(results: Dict[str, Dict[str, Any]], urls_by_key: Dict[str, List[str]], decided_by: str) -> None:
+    """Stream a set of classifications, keyed back to the posts' urls."""
+    if not results:
+        return
+    emit({
+        "type": "classifications",
+        "decided_by": decided_by,
+        "items": [
+            {"url": url, "relevant": bool(r.get("relevant")), "spam": bool(r.get("spam"))}
+            for key, r in results.items()
+            for url in urls_by_key.get(key, [])
+        ],
+    })
 
 
 @traceable(run_type="chain", name="noise_filtering")
-def noise_filtering_node(state: Dict[str, Any]) -> Dict[str, Any]:
+async def noise_filtering_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Node 3: Deduplicate, then batch classify posts with LLM relevance + spam filter.
+    Previously classified texts are served from the classification cache,
+    obvious cases are decided by a local prefilter, and only the remaining
+    ambiguous posts are batched to the LLM concurrently under a shared rate limit.
     """
     keywords = state.get("keywords", [])
     raw_posts = state.get("raw_data", [])
@@ -84,22 +285,88 @@ def noise_filtering_node(state: Dict[str, Any]) -> Dict[str, Any]:
             seen.add(identifier)
             deduped.append(post)
 
+    cache = get_classification_cache()
+    keys = [classification_key(p["text"], keywords, PROMPT_VERSION) for p in deduped]
+    cached = await asyncio.to_thread(cache.get_many, keys) if cache else {}
+    urls_by_key = {}
+    for post, key in zip(deduped, keys):
+        urls_by_key.setdefault(key, []).append(post.get("meta", {}).get("url"))
+    _emit_classifications(cached, urls_by_key, "cache")
+
+    # Only cache misses go to the LLM; identical texts share one slot.
+    pending = {}
+    for post, key in zip(deduped, keys):
+        if key not in cached and key not in pending:
+            pending[key] = post["text"]
+
+    settings = get_llm_settings()
+    batching = get_classify_batching(settings["classify_model"])
+
+    prefiltered = {}
+    model = None
+    prefilter_settings = get_prefilter_settings()
+    if prefilter_settings["enabled"] and pending:
+        # Model training and scoring are CPU-bound; keep them off the event loop
+        prefiltered, model = await asyncio.to_thread(
+            _run_prefilter, pending, keywords, cache, prefilter_settings
+        )
+        _emit_classifications(prefiltered, urls_by_key, "prefilter")
+
+    forwarded = [(k, t) for k, t in pending.items() if k not in prefiltered]
+    # Tokenizing every post is CPU-bound too
+    batches = await asyncio.to_thread(_pack_batches, forwarded, batching)
+
+    semaphore = asyncio.Semaphore(settings["concurrency"])
+
+    async def _limited(batch):
+        async with semaphore:
+            results = await _classify_batch(batch, keywords, settings)
+        _emit_classifications(results, urls_by_key, "llm")
+        return results
+
+    batch_results = await asyncio.gather(*(_limited(batch) for batch in batches))
+
+    classified = {}
+    for results in batch_results:
+        classified.update(results)
+
+    if cache:
+        # Keywords are stored alongside the label so the prefilter model can train on it
+        await asyncio.to_thread(
+            cache.set_many,
+            {k: {**r, "keywords": keywords} for k, r in classified.items() if not r.get("degraded")},
+        )
+    classified.update(prefiltered)
+
     clean = []
-    batch_size = 5
-    for i in range(0, len(deduped), batch_size):
-        batch = deduped[i:i+batch_size]
-        texts = [p["text"] for p in batch]
-        
-        try:
-            results = llm_classify(texts, keywords)
-        except Exception as e:
-            print(f"Batch classification failed: {e}")
+    for post, key in zip(deduped, keys):
+        result = cached.get(key) or classified.get(key)
+        if result is None:
             continue
+        # The label only; the cached text and keywords would repeat the post
+        post["meta"]["classification"] = {k: v for k, v in result.items() if k not in ("post", "keywords")}
+        if result.get("relevant") and not result.get("spam"):
+            clean.append(post)
 
-        for post, result in zip(batch, results):
-            post["meta"]["classification"] = result
-            if result.get("relevant") and not result.get("spam"):
-                clean.append(post)
-
+    hits = sum(1 for key in keys if key in cached)
+    record_cache("classification", "hit", hits)
+    record_cache("classification", "miss", len(keys) - hits)
+    state["classification_cache"] = {
+        "hits": hits,
+        "misses": len(keys) - hits,
+        "hit_rate": round(hits / len(keys), 4) if keys else 0.0,
+        "llm_batches": len(batches),
+        "lifetime": cache.stats() if cache else None,
+    }
+    # Estimated at this run's batch fill rather than by tokenizing every post again
+    posts_per_batch = len(forwarded) / len(batches) if batches else batching["max_batch_posts"]
+    unfiltered_batches = math.ceil(len(pending) / posts_per_batch) if pending else 0
+    state["prefilter"] = {
+        "decided_locally": len(prefiltered),
+        "kept_locally": sum(1 for r in prefiltered.values() if r["relevant"] and not r["spam"]),
+        "forwarded_to_llm": len(forwarded),
+        "llm_calls_avoided": unfiltered_batches - len(batches),
+        "model_trained_on": model.trained_on if model else 0,
+    }
     state["clean_data"] = clean
     return state
@@ -1,18 +1,36 @@
-from typing import Dict, Any
+import multiprocessing
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Any, List, Optional
+
+import xxhash
+from cachetools import LRUCache
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 from langsmith import traceable
-from config import get_brands
+from config import get_sentiment_settings
+from services.brand_catalog import get_brand_catalog
+from services.post_table import PostTable
 
 analyzer = SentimentIntensityAnalyzer()
 
+# Memoized compound scores keyed by text hash, shared across runs in this process
+_sentiment_cache = LRUCache(maxsize=get_sentiment_settings()["cache_size"])
+_sentiment_cache_lock = threading.Lock()
+
+# Sentence ends plus contrastive connectives that usually switch the subject
+# of an opinion ("X is overpriced compared to Y", "X is loud but Y is quiet").
+CLAUSE_SPLIT_RE = re.compile(
+    r"[.!?;\n|]+|\s[-–—]\s|,?\s+\b(?:but|however|whereas|while|compared (?:to|with)|unlike|than|vs\.?|versus)\b\s*",
+    re.IGNORECASE,
+)
 
-@traceable(run_type="tool", name="get_sentiment")
-def _get_sentiment(text: str) -> str:
+
+def _label(compound: float) -> str:
     """
-    Use VADER to classify sentiment.
+    Map a VADER compound score to a sentiment class.
     """
-    scores = analyzer.polarity_scores(text)
-    compound = scores["compound"]
     if compound >= 0.05:
         return "positive"
     elif compound <= -0.05:
@@ -21,25 +39,132 @@ def _get_sentiment(text: str) -> str:
         return "neutral"
 
 
+def _score_chunk(texts: List[str]) -> List[float]:
+    """Worker entry point for the process pool."""
+    return [analyzer.polarity_scores(text)["compound"] for text in texts]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Long-lived scoring pool, created on first large batch. Workers are
+    started by a forkserver (spawn where unavailable) rather than forked,
+    since the caller is a worker thread in a multithreaded server.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool() -> None:
+    """Stop the scoring pool's workers; the next large batch starts a new pool."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+@traceable(run_type="tool", name="get_sentiment_scores")
+def _get_scores(texts: List[str]) -> List[float]:
+    """
+    Score a batch of texts in one call, returning VADER compound scores.
+    Previously seen texts come from the memo; large sets of new texts are
+    spread over a process pool since VADER is pure Python and CPU-bound.
+    """
+    settings = get_sentiment_settings()
+    keys = [xxhash.xxh3_64_intdigest(text) for text in texts]
+
+    with _sentiment_cache_lock:
+        known = {k: _sentiment_cache[k] for k in keys if k in _sentiment_cache}
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in known:
+            missing.setdefault(key, text)
+
+    if missing:
+        miss_keys, miss_texts = list(missing), list(missing.values())
+        if len(miss_texts) >= settings["process_threshold"] and settings["workers"] > 1:
+            chunk = -(-len(miss_texts) // (settings["workers"] * 4))
+            chunks = [miss_texts[i:i+chunk] for i in range(0, len(miss_texts), chunk)]
+            try:
+                pool = _get_pool(settings["workers"])
+                scores = [score for part in pool.map(_score_chunk, chunks) for score in part]
+            except BrokenProcessPool as e:
+                print(f"Sentiment process pool failed, scoring in-process: {e}")
+                shutdown_pool()
+                scores = _score_chunk(miss_texts)
+        else:
+            scores = _score_chunk(miss_texts)
+
+        scored = dict(zip(miss_keys, scores))
+        known.update(scored)
+        with _sentiment_cache_lock:
+            _sentiment_cache.update(scored)
+
+    return [known[k] for k in keys]
+
+
+def _brand_spans(text: str, brands: List[str], catalog) -> Dict[str, List[str]]:
+    """
+    Split a post into clauses and collect, per brand, the clauses that
+    mention it. Brands never named inside a single clause fall back to
+    the whole post.
+    """
+    spans = {}
+    for clause in CLAUSE_SPLIT_RE.split(text):
+        clause = clause.strip()
+        if not clause:
+            continue
+        for brand in catalog.find(clause):
+            spans.setdefault(brand, []).append(clause)
+    for brand in brands:
+        spans.setdefault(brand, [text])
+    return {b: spans[b] for b in brands}
+
+
 @traceable(run_type="chain", name="sentiment_analysis")
 def sentiment_analysis_node(state: Dict[str, Any]) -> Dict[str, Any]:
     """
     Node 6: Run sentiment analysis and tally results per brand.
+    Each brand is credited with the sentiment of the clauses that mention
+    it, so "Orient is overpriced compared to Atomberg" is negative for
+    Orient only. All posts and clauses are scored in a single batch.
     """
-    posts = state.get("tagged_data", [])
-
-    sentiment_totals = {
-        brand: {"positive": 0, "negative": 0, "neutral": 0} for brand in get_brands()
-    }
+    catalog = get_brand_catalog()
+    table = PostTable.from_state(state, catalog.brands)
+    posts = table.posts
 
+    post_spans = []
     for post in posts:
-        sentiment = _get_sentiment(post["text"])
-        post["sentiment"] = sentiment
+        brands = [b for b in post.get("brands", []) if b in table.brand_index]
+        post_spans.append(_brand_spans(post["text"], brands, catalog))
+
+    # One pass over every post text and every brand span
+    texts = [post["text"] for post in posts]
+    texts += [span for spans in post_spans for clauses in spans.values() for span in clauses]
+    scores = dict(zip(texts, _get_scores(texts)))
 
-        for brand in post.get("brands", []):
-            if brand in sentiment_totals:
-                sentiment_totals[brand][sentiment] += 1
+    for row, (post, spans) in enumerate(zip(posts, post_spans)):
+        post["sentiment"] = _label(scores[post["text"]])
+        post["brand_sentiment"] = {}
+        for brand, clauses in spans.items():
+            sentiment = _label(sum(scores[c] for c in clauses) / len(clauses))
+            post["brand_sentiment"][brand] = sentiment
+            table.set_brand_sentiment(row, brand, sentiment)
 
-    state["sentiment_totals"] = sentiment_totals
+    state["post_table"] = table
+    state["sentiment_totals"] = table.sentiment_dict()
     state["sentiment_tagged_data"] = posts
     return state
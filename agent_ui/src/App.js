@@ -21,6 +21,10 @@ const steps = [
 
 export default function App() {
   const [agentOutput, setAgentOutput] = useState(null);
+  // Filled from partial events while the run is still going
+  const [sources, setSources] = useState([]);
+  const [classifications, setClassifications] = useState({});
+  const [provisionalMetrics, setProvisionalMetrics] = useState(null);
   const [currentStep, setCurrentStep] = useState(0);
   const [activeTab, setActiveTab] = useState("steps");
   const [isRunning, setIsRunning] = useState(false);
@@ -31,6 +35,11 @@ export default function App() {
     setError(null);
     setCurrentStep(0);
     setAgentOutput(null);
+    setSources([]);
+    setClassifications({});
+    setProvisionalMetrics(null);
+
+    const seenSources = new Set();
 
     try {
       await runAgentWithProgress(
@@ -53,7 +62,6 @@ export default function App() {
         (result) => {
           console.log("Complete:", result);
           setAgentOutput({
-            sources: result.sources,
             metrics: result.metrics,
             insights: result.insights,
           });
@@ -65,6 +73,26 @@ export default function App() {
           console.error("Error:", errorMessage);
           setError(errorMessage);
           setIsRunning(false);
+        },
+        {
+          onPosts: (posts) => {
+            // The same post can be found by several keywords
+            const fresh = posts.filter((post) => {
+              const id = post.url || `${post.platform}:${post.text}`;
+              if (seenSources.has(id)) return false;
+              seenSources.add(id);
+              return true;
+            });
+            if (fresh.length) setSources((prev) => [...prev, ...fresh]);
+          },
+          onClassifications: (items) => {
+            setClassifications((prev) => {
+              const next = { ...prev };
+              for (const item of items) next[item.url] = item;
+              return next;
+            });
+          },
+          onMetrics: (metrics) => setProvisionalMetrics(metrics),
         }
       );
     } catch (err) {
@@ -92,14 +120,16 @@ export default function App() {
 
       {activeTab === "steps" && <StepsFlow currentStep={currentStep} />}
       {activeTab === "sources" && (
-        <SourcesDisplay sources={agentOutput ? agentOutput.sources : []} />
+        <SourcesDisplay sources={sources} classifications={classifications} />
       )}
 
-      {agentOutput && (
+      {agentOutput ? (
         <>
           <MetricsDisplay metrics={agentOutput.metrics} />
           <InsightDisplay insight={agentOutput.insights} />
         </>
+      ) : (
+        <MetricsDisplay metrics={provisionalMetrics} provisional />
       )}
     </div>
   );
@@ -16,18 +16,10 @@ export function runAgentWithProgress(
   { keywords, n },
   onProgress,
   onComplete,
-  onError
+  onError,
+  // Optional partial results: { onPosts, onClassifications, onMetrics }
+  partial = {}
 ) {
-  const eventSource = new EventSource(
-    `https://atomberg-shareofvoice-ai-agent.onrender.com/run-agent-stream`,
-    {
-      method: "POST",
-      headers: { "Content-Type": "application/json" },
-      body: JSON.stringify({ keywords, n }),
-    }
-  );
-
-  // Note: EventSource doesn't support POST with body, so we need to use fetch with streaming
   return fetch("https://atomberg-shareofvoice-ai-agent.onrender.com/run-agent-stream", {
     method: "POST",
     headers: { "Content-Type": "application/json" },
@@ -39,6 +31,31 @@ export function runAgentWithProgress(
 
     const reader = response.body.getReader();
     const decoder = new TextDecoder();
+    // Events can span chunks; keep the unfinished tail for the next read
+    let buffer = "";
+
+    // Returns true once the stream has ended
+    function handle(data) {
+      if (data.type === "progress") {
+        onProgress(data);
+      } else if (data.type === "posts") {
+        partial.onPosts && partial.onPosts(data.posts, data);
+      } else if (data.type === "classifications") {
+        partial.onClassifications && partial.onClassifications(data.items, data);
+      } else if (data.type === "metrics") {
+        partial.onMetrics && partial.onMetrics(data.metrics, data);
+      } else if (data.type === "complete") {
+        onComplete(data);
+        return true;
+      } else if (data.type === "error") {
+        onError(data.message);
+        return true;
+      } else if (data.type === "cancelled") {
+        onError("Run cancelled");
+        return true;
+      }
+      return false;
+    }
 
     function readStream() {
       return reader.read().then(({ done, value }) => {
@@ -46,25 +63,25 @@ export function runAgentWithProgress(
           return;
         }
 
-        const chunk = decoder.decode(value);
-        const lines = chunk.split("\n");
+        buffer += decoder.decode(value, { stream: true });
+        const messages = buffer.split("\n\n");
+        buffer = messages.pop();
 
-        for (const line of lines) {
-          if (line.startsWith("data: ")) {
+        for (const message of messages) {
+          for (const line of message.split("\n")) {
+            if (!line.startsWith("data: ")) {
+              continue;
+            }
+            let data;
             try {
-              const data = JSON.parse(line.slice(6));
-
-              if (data.type === "progress") {
-                onProgress(data);
-              } else if (data.type === "complete") {
-                onComplete(data);
-                return; // End the stream
-              } else if (data.type === "error") {
-                onError(data.message);
-                return; // End the stream
-              }
+              data = JSON.parse(line.slice(6));
             } catch (e) {
               console.error("Error parsing SSE data:", e);
+              continue;
+            }
+            if (handle(data)) {
+              reader.cancel();
+              return; // End the stream
             }
           }
         }
@@ -1,8 +1,11 @@
-export default function MetricsDisplay({ metrics }) {
+export default function MetricsDisplay({ metrics, provisional = false }) {
   if (!metrics) return null;
   return (
     <div>
-      <h2>Brand Metrics</h2>
+      <h2>
+        Brand Metrics{" "}
+        {provisional && <small className="text-muted">(provisional, updating)</small>}
+      </h2>
       <pre>{JSON.stringify(metrics, null, 2)}</pre>
     </div>
   );
@@ -1,5 +1,5 @@
 // src/components/SourcesDisplay.jsx
-export default function SourcesDisplay({ sources }) {
+export default function SourcesDisplay({ sources, classifications = {} }) {
   if (!sources || sources.length === 0) return null;
 
   // Group by platform
@@ -14,13 +14,20 @@ export default function SourcesDisplay({ sources }) {
         <div key={platform} className="mb-3">
           <h5>{platform}</h5>
           <ul className="list-group">
-            {items.map((item, idx) => (
-              <li key={idx} className="list-group-item">
-                <a href={item.meta.url || '#'} target="_blank" rel="noopener noreferrer">
-                  {item.text.length > 80 ? item.text.slice(0, 80) + '...' : item.text}
-                </a>
-              </li>
-            ))}
+            {items.map((item, idx) => {
+              // Streamed posts are flat; older results keep the url under meta
+              const url = item.url || (item.meta && item.meta.url);
+              const label = classifications[url];
+              const filtered = label && (!label.relevant || label.spam);
+              return (
+                <li key={idx} className={`list-group-item${filtered ? ' text-muted' : ''}`}>
+                  <a href={url || '#'} target="_blank" rel="noopener noreferrer">
+                    {item.text.length > 80 ? item.text.slice(0, 80) + '...' : item.text}
+                  </a>
+                  {filtered && <span className="badge bg-secondary ms-2">{label.spam ? 'spam' : 'off-topic'}</span>}
+                </li>
+              );
+            })}
           </ul>
         </div>
       ))}
@@ -1,6 +1,7 @@
 """
 Configuration file for the Market Research Agent
 """
+import os
 
 # Default brands to track
 DEFAULT_BRANDS = [
@@ -18,6 +19,18 @@ DEFAULT_BRANDS = [
     "Usha"
 ]
 
+# Alternative names, product lines and SKUs that count as a mention of a
+# brand, in addition to the brand name itself. Override with a JSON/YAML
+# file via BRAND_CATALOG_PATH or inline JSON via BRAND_CATALOG.
+DEFAULT_BRAND_CATALOG = {
+    "Atomberg": {"aliases": ["Gorilla Fans"], "product_lines": ["Renesa", "Efficio"]},
+    "Crompton": {"aliases": ["Crompton Greaves"], "product_lines": ["Energion"]},
+    "Havells": {"product_lines": ["Efficiencia"]},
+    "Orient": {"aliases": ["Orient Electric"], "product_lines": ["Aeroquiet"]},
+    "V-Guard": {"aliases": ["VGuard"]},
+    "SuperFan": {"aliases": ["Super Fan"]},
+}
+
 # Default keywords
 DEFAULT_KEYWORDS = ["smart fan"]
 
@@ -25,9 +38,29 @@ PROJECT_NAME = "Market Research Agent"
 API_TITLE = "Market Research Agent API"
 LANGCHAIN_PROJECT = "Market-Research-Agent"
 
+def _env_float(name, default, minimum=None):
+    """Float env var; unset or unparsable values give `default`, then clamp to `minimum`"""
+    try:
+        value = float(os.getenv(name, default))
+    except ValueError:
+        value = float(default)
+    return value if minimum is None else max(minimum, value)
+
+def _env_int(name, default, minimum=None):
+    """Integer env var ("4.0" is accepted); same fallback and clamping as _env_float"""
+    return int(_env_float(name, default, minimum))
+
+def _env_flag(name, default):
+    """Boolean env var: on/true/yes/1 or off/false/no/0; anything else gives `default`"""
+    value = os.getenv(name, "").strip().lower()
+    if value in ("1", "true", "yes", "on"):
+        return True
+    if value in ("0", "false", "no", "off"):
+        return False
+    return default
+
 def get_brands():
     """Get the list of brands to track"""
-    import os
     brands_env = os.getenv("BRANDS", "")
     if brands_env:
         # Support comma-separated or space-separated brands
@@ -39,7 +72,6 @@ def get_brands():
 
 def get_keywords():
     """Get the default keywords"""
-    import os
     keywords_env = os.getenv("KEYWORDS", "")
     if keywords_env:
         # Support comma-separated or space-separated keywords
@@ -48,3 +80,146 @@ def get_keywords():
         else:
             return [keyword.strip() for keyword in keywords_env.split() if keyword.strip()]
     return DEFAULT_KEYWORDS
+
+def get_source_timeout():
+    """Get the per-source fetch timeout in seconds"""
+    return _env_float("SOURCE_TIMEOUT_SECONDS", 45)
+
+def get_provider_concurrency():
+    """Get the max number of in-flight requests per data provider"""
+    return _env_int("PROVIDER_CONCURRENCY", 4, minimum=1)
+
+def get_fetch_cache_settings():
+    """Get on-disk fetch cache settings (directory, TTLs, size bound)"""
+    default_ttl = _env_float("FETCH_CACHE_TTL_SECONDS", 3600)
+    return {
+        "enabled": _env_flag("FETCH_CACHE", True),
+        "dir": os.getenv("FETCH_CACHE_DIR", ".cache/fetch"),
+        "ttl": {
+            "google": _env_float("FETCH_CACHE_TTL_GOOGLE", default_ttl),
+            "youtube": _env_float("FETCH_CACHE_TTL_YOUTUBE", default_ttl),
+        },
+        "default_ttl": default_ttl,
+        # Serve expired entries for this long while refreshing in the background
+        "stale_while_revalidate": _env_float("FETCH_CACHE_STALE_SECONDS", 86400),
+        "max_bytes": int(_env_float("FETCH_CACHE_MAX_MB", 64) * 1024 * 1024),
+    }
+
+def get_llm_settings():
+    """Get LLM concurrency, rate limit and retry settings"""
+    return {
+        "concurrency": _env_int("LLM_CONCURRENCY", 4, minimum=1),
+        "requests_per_minute": _env_float("LLM_REQUESTS_PER_MINUTE", 60),
+        "burst": _env_int("LLM_BURST", 4, minimum=1),
+        "max_retries": _env_int("LLM_MAX_RETRIES", 4, minimum=0),
+        "classify_model": os.getenv("LLM_CLASSIFY_MODEL", "gemini-1.5-flash"),
+    }
+
+def get_classification_cache_settings():
+    """Get persistent LLM classification cache settings"""
+    return {
+        "enabled": _env_flag("CLASSIFICATION_CACHE", True),
+        "path": os.getenv("CLASSIFICATION_CACHE_PATH", ".cache/classifications.sqlite3"),
+        "max_entries": _env_int("CLASSIFICATION_CACHE_MAX_ENTRIES", 50000),
+    }
+
+# Prompt-token budget per classification request, by model
+CLASSIFY_BATCH_TOKEN_BUDGETS = {
+    "gemini-1.5-flash": 8000,
+    "gemini-2.5-flash": 8000,
+    "gpt-4o-mini": 6000,
+}
+
+def get_classify_batching(model):
+    """Get token-aware batching limits for relevance classification"""
+    return {
+        "batch_tokens": _env_int("CLASSIFY_BATCH_TOKENS", CLASSIFY_BATCH_TOKEN_BUDGETS.get(model, 4000)),
+        "max_post_tokens": _env_int("CLASSIFY_MAX_POST_TOKENS", 400),
+        # Bounds the size of the JSON reply as well as the prompt
+        "max_batch_posts": _env_int("CLASSIFY_MAX_BATCH_POSTS", 25),
+    }
+
+def get_prefilter_settings():
+    """Get local relevance prefilter thresholds"""
+    return {
+        "enabled": _env_flag("PREFILTER", True),
+        # Model probability needed to skip the LLM, in either direction
+        "confidence": _env_float("PREFILTER_CONFIDENCE", 0.9),
+        "min_training_labels": _env_int("PREFILTER_MIN_TRAINING_LABELS", 200),
+        "max_training_labels": _env_int("PREFILTER_MAX_TRAINING_LABELS", 5000),
+        "retrain_seconds": _env_float("PREFILTER_RETRAIN_SECONDS", 600),
+    }
+
+def get_sentiment_settings():
+    """Get batch sentiment scoring settings"""
+    return {
+        # Below this many uncached texts, scoring stays in-process
+        "process_threshold": _env_int("SENTIMENT_PROCESS_THRESHOLD", 2000),
+        "workers": _env_int("SENTIMENT_WORKERS", os.cpu_count() or 2, minimum=1),
+        "cache_size": _env_int("SENTIMENT_CACHE_SIZE", 100000),
+    }
+
+def get_breakdown_settings():
+    """Get metric breakdown settings"""
+    return {
+        # "day", "week" or "month"
+        "time_bucket": os.getenv("METRICS_TIME_BUCKET", "month"),
+        "top_authors": _env_int("METRICS_TOP_AUTHORS", 20),
+    }
+
+def get_post_store_path():
+    """Get the SQLite path used by incremental runs"""
+    return os.getenv("POST_STORE_PATH", ".cache/posts.sqlite3")
+
+def get_job_settings():
+    """Get background job queue settings"""
+    return {
+        "workers": _env_int("JOB_WORKERS", 2, minimum=1),
+        "per_tenant": _env_int("JOB_TENANT_CONCURRENCY", 1, minimum=1),
+        "max_queued_per_tenant": _env_int("JOB_TENANT_MAX_QUEUED", 10, minimum=1),
+        "store_path": os.getenv("JOB_STORE_PATH", ".cache/jobs.sqlite3"),
+    }
+
+def get_coalesce_ttl():
+    """Get how long a finished analysis is reused for identical requests"""
+    return _env_float("COALESCE_RESULT_TTL_SECONDS", 60, minimum=0.0)
+
+def get_youtube_settings():
+    """Get YouTube deep-fetch settings (quota ceilings are in get_budget_settings)"""
+    return {
+        # Paginate search and harvest comment threads instead of one page of videos
+        "deep": _env_flag("YOUTUBE_DEEP_FETCH", False),
+        "deep_max_videos": _env_int("YOUTUBE_DEEP_MAX_VIDEOS", 200, minimum=0),
+        "comment_videos": _env_int("YOUTUBE_COMMENT_VIDEOS", 20, minimum=0),
+        "comments_per_video": _env_int("YOUTUBE_COMMENTS_PER_VIDEO", 200, minimum=0),
+        "comment_concurrency": _env_int("YOUTUBE_COMMENT_CONCURRENCY", 8, minimum=1),
+    }
+
+def get_google_settings():
+    """Get SerpAPI pagination and vertical settings"""
+    verticals = [v.strip().lower() for v in os.getenv("GOOGLE_VERTICALS", "web").split(",") if v.strip()]
+    return {
+        # Result pages (10 results each) fetched per vertical
+        "pages": _env_int("GOOGLE_PAGES", 1, minimum=1),
+        # Any of: web, news, videos, discussions
+        "verticals": verticals or ["web"],
+        # SerpAPI requests in flight across every keyword
+        "page_concurrency": _env_int("GOOGLE_PAGE_CONCURRENCY", 8, minimum=1),
+    }
+
+def get_budget_settings():
+    """Get per-run and per-day usage ceilings (0 = unlimited)"""
+    return {
+        "per_run": {
+            "serpapi_searches": _env_int("SERPAPI_SEARCHES_PER_RUN", 0, minimum=0),
+            "youtube_units": _env_int("YOUTUBE_QUOTA_PER_RUN", 3000, minimum=0),
+            "llm_tokens": _env_int("LLM_TOKENS_PER_RUN", 0, minimum=0),
+        },
+        "per_day": {
+            "serpapi_searches": _env_int("SERPAPI_SEARCHES_PER_DAY", 0, minimum=0),
+            # Default YouTube Data API quota; it resets at midnight Pacific, days here are UTC
+            "youtube_units": _env_int("YOUTUBE_QUOTA_PER_DAY", 10000, minimum=0),
+            "llm_tokens": _env_int("LLM_TOKENS_PER_DAY", 0, minimum=0),
+        },
+        "store_path": os.getenv("BUDGET_STORE_PATH", ".cache/budget.sqlite3"),
+    }
@@ -1,4 +1,5 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple, Callable
+import inspect
 import os
 import argparse
 import asyncio
@@ -15,39 +16,116 @@ from agent.nodes.engagement_aggregation import engagement_aggregation_node
 from agent.nodes.sentiment_analysis import sentiment_analysis_node
 from agent.nodes.metric_computation import metric_computation_node
 from agent.nodes.insight_generation import insight_generation_node
-from config import get_keywords, PROJECT_NAME
+from agent.nodes.delta_detection import delta_detection_node
+from agent.nodes.delta_merge import delta_merge_node
+from agent.nodes.engagement_refresh import engagement_refresh_node
+from config import get_keywords, get_breakdown_settings, PROJECT_NAME
+from services.budget import budget_scope
+from services.instrumentation import instrument_node, run_stats
+from services.metrics_engine import compute_metrics
+from services.progress import EventStream
+from services.resources import get_resources
 
+# Steps after which the stream carries metrics over the posts tagged so far
+PROVISIONAL_METRIC_STEPS = ("Brand Tagging", "Engagement Aggregation", "Sentiment Analysis")
 
-def build_graph():
+
+def offloaded(node: Callable[[Dict[str, Any]], Dict[str, Any]]) -> Callable:
+    """
+    Async nodes run as-is; synchronous (CPU-bound) nodes are moved to a
+    worker thread so they never block the event loop.
+    """
+    if inspect.iscoroutinefunction(node):
+        return node
+
+    async def run(state: Dict[str, Any]) -> Dict[str, Any]:
+        return await asyncio.to_thread(node, state)
+
+    run.__name__ = node.__name__
+    return run
+
+
+def pipeline_steps(incremental: bool = False) -> List[Tuple[str, List[Tuple[str, Callable]]]]:
+    """
+    The pipeline as (step name, [(node name, async node function)]) in
+    order. Incremental runs drop already-processed posts right after
+    retrieval and merge the rest into stored counts instead of recomputing
+    metrics.
+    """
+    steps = [
+        ("Keyword & Brand Setup", [("keyword_setup", keyword_setup_node)]),
+        ("Data Retrieval", [("data_retrieval", data_retrieval_node)]
+            + ([("delta_detection", delta_detection_node)] if incremental else [])),
+        ("Noise Filtering", [("noise_filtering", noise_filtering_node)]),
+        ("Brand Tagging", [("brand_tagging", brand_tagging_node)]),
+        ("Engagement Aggregation", [("engagement_aggregation", engagement_aggregation_node)]),
+        ("Sentiment Analysis", [("sentiment_analysis", sentiment_analysis_node)]),
+        ("Metric Computation", [("delta_merge", delta_merge_node)] if incremental
+            else [("metric_computation", metric_computation_node)]),
+        ("Insight Generation", [("insight_generation", insight_generation_node)]),
+    ]
+    return [(step, [(name, offloaded(instrument_node(name, func))) for name, func in nodes]) for step, nodes in steps]
+
+
+def get_pipeline_steps(incremental: bool = False) -> List[Tuple[str, List[Tuple[str, Callable]]]]:
+    """pipeline_steps() built and instrumented once per mode, shared by the graph and the stream."""
+    return get_resources().get_or_create(
+        ("pipeline_steps", incremental), lambda: pipeline_steps(incremental)
+    )
+
+
+def build_graph(incremental: bool = False):
     """
     Construct the LangGraph workflow using modular node implementations.
     Return a compiled graph ready to invoke.
     """
     workflow = StateGraph(Dict[str, Any])
 
-    workflow.add_node("keyword_setup", keyword_setup_node)
-    workflow.add_node("data_retrieval", data_retrieval_node)
-    workflow.add_node("noise_filtering", noise_filtering_node)
-    workflow.add_node("brand_tagging", brand_tagging_node)
-    workflow.add_node("engagement_aggregation", engagement_aggregation_node)
-    workflow.add_node("sentiment_analysis", sentiment_analysis_node)
-    workflow.add_node("metric_computation", metric_computation_node)
-    workflow.add_node("insight_generation", insight_generation_node)
-
-    workflow.set_entry_point("keyword_setup")
-
-    workflow.add_edge("keyword_setup", "data_retrieval")
-    workflow.add_edge("data_retrieval", "noise_filtering")
-    workflow.add_edge("noise_filtering", "brand_tagging")
-    workflow.add_edge("brand_tagging", "engagement_aggregation")
-    workflow.add_edge("engagement_aggregation", "sentiment_analysis")
-    workflow.add_edge("sentiment_analysis", "metric_computation")
-    workflow.add_edge("metric_computation", "insight_generation")
-    workflow.add_edge("insight_generation", END)
+    nodes = [node for _, step in get_pipeline_steps(incremental) for node in step]
+    for name, func in nodes:
+        workflow.add_node(name, func)
+
+    workflow.set_entry_point(nodes[0][0])
+    for (name, _), (next_name, _) in zip(nodes, nodes[1:]):
+        workflow.add_edge(name, next_name)
+    workflow.add_edge(nodes[-1][0], END)
 
     return workflow.compile()
 
 
+def get_graph(incremental: bool = False):
+    """Compiled graph shared across runs; compiled on first use, once per mode."""
+    return get_resources().get_or_create(
+        ("graph", incremental), lambda: build_graph(incremental=incremental)
+    )
+
+
+async def init_resources() -> None:
+    """Warm the shared registry at startup so requests don't pay setup costs."""
+    resources = get_resources()
+    # The streaming endpoint walks the steps itself; graphs compile lazily for the other callers
+    for incremental in (False, True):
+        get_pipeline_steps(incremental)
+    resources.http
+    if os.getenv("GOOGLE_API_KEY"):
+        resources.gemini(os.getenv("GOOGLE_API_KEY"))
+        resources.gemini(os.getenv("GOOGLE_API_KEY"), max_retries=0)
+    if os.getenv("OPENAI_API_KEY"):
+        resources.openai(os.getenv("OPENAI_API_KEY"))
+
+
+async def _invoke_metered(graph, initial_state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the graph with every fetch and LLM call charged to one budget
+    ledger, and its node and call timings collected.
+    """
+    with budget_scope() as ledger, run_stats() as stats:
+        final_state = await graph.ainvoke(initial_state)
+    final_state["budget_usage"] = ledger.summary()
+    final_state["run_timings"] = stats.summary()
+    return final_state
+
+
 def _parse_keywords_env(value: str) -> List[str]:
     if not value:
         return []
@@ -79,33 +157,56 @@ def parse_args() -> argparse.Namespace:
         default=env_topn_int or 20,
         help="Items to fetch per platform. Fallback: TOP_N_PER_PLATFORM env",
     )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only process posts not seen in a previous run and merge them into stored metrics",
+    )
+    parser.add_argument(
+        "--refresh-engagement",
+        action="store_true",
+        help="Update engagement of posts stored by --incremental runs and recompute metrics, without fetching or classifying",
+    )
     return parser.parse_args()
 
 
 
 @traceable(run_type="chain", name="atomberg_market_research_agent")
-def run_pipeline_server(initial_state=None):
+async def run_pipeline_server(initial_state=None):
     if initial_state is None:
         initial_state = {
             "keywords": get_keywords(),
             "top_n_per_platform": 20,
         }
-    graph = build_graph()
-    final_state = graph.invoke(initial_state)
-    return final_state
+    graph = get_graph(incremental=bool(initial_state.get("incremental")))
+    return await _invoke_metered(graph, initial_state)
+
+@traceable(run_type="chain", name="atomberg_market_research_engagement_refresh")
+async def run_engagement_refresh(initial_state: Dict[str, Any]) -> Dict[str, Any]:
+    """Cheap update of engagement and metrics for posts already known from incremental runs."""
+    with budget_scope() as ledger, run_stats() as stats:
+        state = await instrument_node("engagement_refresh", engagement_refresh_node)(dict(initial_state))
+    state["budget_usage"] = ledger.summary()
+    state["run_timings"] = stats.summary()
+    return state
+
 
 @traceable(run_type="chain", name="atomberg_market_research_pipeline")
 def run_pipeline() -> Dict[str, Any]:
     args = parse_args()
 
-    graph = build_graph()
+    if args.refresh_engagement:
+        return asyncio.run(run_engagement_refresh({"keywords": args.keywords}))
+
+    graph = get_graph(incremental=args.incremental)
 
     initial_state: Dict[str, Any] = {
         "keywords": args.keywords,
         "top_n_per_platform": args.top_n_per_platform,
+        "incremental": args.incremental,
     }
 
-    final_state = graph.invoke(initial_state)
+    final_state = asyncio.run(_invoke_metered(graph, initial_state))
     return final_state
 
 @traceable(run_type="chain", name="atomberg_market_research_agent_with_progress")
@@ -117,66 +218,50 @@ async def run_pipeline_server_with_progress(initial_state=None):
             "top_n_per_platform": 20,
         }
     
-    # Step names mapping
-    step_names = [
-        "Keyword & Brand Setup",
-        "Data Retrieval", 
-        "Noise Filtering",
-        "Brand Tagging",
-        "Engagement Aggregation",
-        "Sentiment Analysis",
-        "Metric Computation",
-        "Insight Generation"
-    ]
-    
-    try:
-        from agent.nodes.keyword_setup import keyword_setup_node
-        from agent.nodes.data_retrieval import data_retrieval_node
-        from agent.nodes.noise_filtering import noise_filtering_node
-        from agent.nodes.brand_tagging import brand_tagging_node
-        from agent.nodes.engagement_aggregation import engagement_aggregation_node
-        from agent.nodes.sentiment_analysis import sentiment_analysis_node
-        from agent.nodes.metric_computation import metric_computation_node
-        from agent.nodes.insight_generation import insight_generation_node
-        
-        node_functions = [
-            keyword_setup_node,
-            data_retrieval_node,
-            noise_filtering_node,
-            brand_tagging_node,
-            engagement_aggregation_node,
-            sentiment_analysis_node,
-            metric_computation_node,
-            insight_generation_node
-        ]
-        
-        state = initial_state.copy()
-        current_step = 1
+    with budget_scope() as ledger, run_stats() as stats:
+        try:
+            state = initial_state.copy()
+            current_step = 1
         
-        for step_name, node_func in zip(step_names, node_functions):
-            # Mark step as in progress
-            yield {"type": "progress", "currentStep": current_step, "stepName": step_name, "status": "in_progress"}
+            for step_name, nodes in get_pipeline_steps(bool(initial_state.get("incremental"))):
+                # Mark step as in progress
+                yield {"type": "progress", "currentStep": current_step, "stepName": step_name, "status": "in_progress"}
             
-            try:
-                state = node_func(state)
+                try:
+                    for _, node_func in nodes:
+                        # Stream the node's partial results while it runs
+                        events = EventStream()
+                        task = events.start(node_func(state))
+                        async for event in events.drain(task):
+                            yield event
+                        state = task.result()
                 
-                # Mark step as completed
-                yield {"type": "progress", "currentStep": current_step, "stepName": step_name, "status": "completed"}
-                current_step += 1
+                    # Mark step as completed
+                    yield {"type": "progress", "currentStep": current_step, "stepName": step_name, "status": "completed"}
+                    current_step += 1
+
+                    if step_name in PROVISIONAL_METRIC_STEPS and not initial_state.get("incremental"):
+                        table = state.get("post_table")
+                        if table is not None:
+                            metrics, _ = await asyncio.to_thread(compute_metrics, table, get_breakdown_settings())
+                            yield {"type": "metrics", "provisional": True, "stepName": step_name, "metrics": metrics}
                 
-            except Exception as e:
-                yield {"type": "progress", "currentStep": current_step, "stepName": step_name, "status": "error", "error": str(e)}
-                raise e
+                except Exception as e:
+                    yield {"type": "progress", "currentStep": current_step, "stepName": step_name, "status": "error", "error": str(e)}
+                    raise e
         
-        yield {
-            "type": "complete",
-            "sources": state.get("raw_data", []),
-            "metrics": state.get("metrics", {}),
-            "insights": state.get("insights", {}),
-        }
+            yield {
+                "type": "complete",
+                "sources": state.get("raw_data", []),
+                "metrics": state.get("metrics", {}),
+                "breakdowns": state.get("metric_breakdowns", {}),
+                "insights": state.get("insights", {}),
+                "usage": ledger.summary(),
+                "timings": stats.summary(),
+            }
         
-    except Exception as e:
-        yield {"type": "error", "message": str(e)}
+        except Exception as e:
+            yield {"type": "error", "message": str(e)}
 
 if __name__ == "__main__":
     load_dotenv()
@@ -1,11 +1,20 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, Header
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Optional
-from main import run_pipeline, run_pipeline_server, run_pipeline_server_with_progress
-from config import get_keywords, API_TITLE
-import json
+from contextlib import asynccontextmanager
+from agent.nodes.sentiment_analysis import shutdown_pool as shutdown_sentiment_pool
+from main import init_resources, run_engagement_refresh, run_pipeline, run_pipeline_server_with_progress
+from services.resources import get_resources
+from services.budget import get_budget_store
+from services.instrumentation import render_metrics
+from services.job_queue import JobManager, TenantLimitError
+from services.job_store import JobStore
+from services.single_flight import SingleFlight
+from config import get_keywords, get_job_settings, get_coalesce_ttl, API_TITLE
+import orjson
 import asyncio
+import time
 
 from dotenv import load_dotenv
 import os
@@ -14,7 +23,23 @@ load_dotenv()
 
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title=API_TITLE)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile graphs and open long-lived clients once, not per request
+    await init_resources()
+    # Identical concurrent analyses (and repeats within the TTL) share one pipeline run
+    app.state.flights = SingleFlight(run_pipeline_server_with_progress, get_coalesce_ttl())
+    settings = get_job_settings()
+    app.state.jobs = JobManager(JobStore(settings["store_path"]), app.state.flights.stream, settings)
+    await app.state.jobs.start()
+    yield
+    await app.state.jobs.stop()
+    await get_resources().aclose()
+    await asyncio.to_thread(shutdown_sentiment_pool)
+
+
+app = FastAPI(title=API_TITLE, lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "https://atomberg-share-of-voice-ai-agent.vercel.app"],
@@ -27,25 +52,55 @@ app.add_middleware(
 class AgentRequest(BaseModel):
     keywords: List[str] = get_keywords()
     n: Optional[int] = 20
+    incremental: bool = False
+
+
+def _sse(event):
+    """
+    One SSE message, serialized with orjson. Sources were already streamed
+    as "posts" events, so the final message only carries their count.
+    """
+    if event.get("type") == "complete" and "sources" in event:
+        event = {
+            **{k: v for k, v in event.items() if k != "sources"},
+            "source_count": len(event["sources"]),
+        }
+    return b"data: " + orjson.dumps(event, option=orjson.OPT_SERIALIZE_NUMPY) + b"\n\n"
+
+
+def _initial_state(req: AgentRequest):
+    return {
+        "keywords": req.keywords,
+        "top_n_per_platform": req.n,
+        "incremental": req.incremental,
+    }
+
 
 @app.post("/run-agent")
 async def run_agent(req: AgentRequest):
     try:
-        initial_state = {
-            "keywords": req.keywords,
-            "top_n_per_platform": req.n,
-        }
-        final_state = run_pipeline_server(initial_state)
+        final = await app.state.flights.result(_initial_state(req))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if final["type"] != "complete":
+        raise HTTPException(status_code=500, detail=final.get("message") or final["type"])
+    return {k: v for k, v in final.items() if k != "type"}
 
-        response = {
-            "sources": final_state.get("raw_data", []),
-            "metrics": final_state.get("metrics", {}),
-            "insights": final_state.get("insights", {}),
-        }
 
-        return response
+@app.post("/refresh-engagement")
+async def refresh_engagement(req: AgentRequest):
+    """Re-pull engagement of known posts and recompute metrics; no search or LLM calls."""
+    try:
+        state = await run_engagement_refresh(_initial_state(req))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "metrics": state.get("metrics", {}),
+        "breakdowns": state.get("metric_breakdowns", {}),
+        "engagement": state.get("engagement_totals", {}),
+        "refresh": state.get("engagement_refresh", {}),
+        "usage": state.get("budget_usage", {}),
+    }
 
 
 @app.post("/run-agent-stream")
@@ -53,23 +108,88 @@ async def run_agent_stream(req: AgentRequest):
     print(f"Received request at /run-agent-stream [POST]: {req.json()}")
     async def generate_progress():
         try:
-            initial_state = {
-                "keywords": req.keywords,
-                "top_n_per_platform": req.n,
-            }
+            initial_state = _initial_state(req)
             
             # Stream progress updates
-            async for progress_data in run_pipeline_server_with_progress(initial_state):
-                yield f"data: {json.dumps(progress_data)}\n\n"
-                await asyncio.sleep(0.1) 
+            async for progress_data in app.state.flights.stream(initial_state):
+                yield _sse(progress_data)
                 
         except Exception as e:
             error_data = {"type": "error", "message": str(e)}
-            yield f"data: {json.dumps(error_data)}\n\n"
+            yield _sse(error_data)
     
     return StreamingResponse(
         generate_progress(),
-        media_type="text/plain",
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "Access-Control-Allow-Origin": "*",
+        }
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Node, fetcher and LLM timings, cache lookups, retries and HTTP bytes in Prometheus text format."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/usage")
+async def usage(day: Optional[str] = None):
+    """Recorded SerpAPI, YouTube and LLM usage per resource and keyword for a UTC day (default today)."""
+    day = day or time.strftime("%Y-%m-%d", time.gmtime())
+    return {"day": day, "usage": await asyncio.to_thread(get_budget_store().daily, day)}
+
+
+async def _get_job(job_id: str, tenant: str):
+    job = await app.state.jobs.get(job_id)
+    # Other tenants' jobs are indistinguishable from missing ones
+    if job is None or job["tenant"] != tenant:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/jobs", status_code=202)
+async def create_job(req: AgentRequest, x_tenant_id: str = Header(default="anonymous")):
+    try:
+        job_id = await app.state.jobs.submit(x_tenant_id, _initial_state(req))
+    except TenantLimitError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {"id": job_id, "status": "queued"}
+
+
+@app.get("/jobs")
+async def list_jobs(x_tenant_id: str = Header(default="anonymous")):
+    return {"jobs": await app.state.jobs.list_jobs(x_tenant_id)}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, x_tenant_id: str = Header(default="anonymous")):
+    job = await _get_job(job_id, x_tenant_id)
+    job.pop("tenant")
+    return job
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str, x_tenant_id: str = Header(default="anonymous")):
+    job = await _get_job(job_id, x_tenant_id)
+    if not await app.state.jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    return {"id": job_id, "status": "cancelling"}
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, x_tenant_id: str = Header(default="anonymous")):
+    await _get_job(job_id, x_tenant_id)
+
+    async def generate_events():
+        async for event in app.state.jobs.events(job_id):
+            yield _sse(event)
+
+    return StreamingResponse(
+        generate_events(),
+        media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
             "Connection": "keep-alive",
@@ -0,0 +1,73 @@
+import json
+import os
+from functools import lru_cache
+from typing import Any, Dict, List
+
+from config import DEFAULT_BRAND_CATALOG, get_brands
+from services.brand_matcher import BrandMatcher
+
+CATALOG_FIELDS = ("aliases", "product_lines", "skus")
+
+
+class BrandCatalog:
+    """
+    Tracked brands with the aliases, product lines and SKUs that count as a
+    mention of each, compiled once into a BrandMatcher.
+    """
+
+    def __init__(self, entries: Dict[str, Dict[str, List[str]]]):
+        self.entries = {
+            brand: {field: list(entry.get(field) or []) for field in CATALOG_FIELDS}
+            for brand, entry in entries.items()
+        }
+        self.brands = list(self.entries)
+        self.matcher = BrandMatcher(
+            {
+                brand: [term for field in CATALOG_FIELDS for term in entry[field]]
+                for brand, entry in self.entries.items()
+            }
+        )
+
+    def find(self, text: str) -> List[str]:
+        return self.matcher.find(text)
+
+
+def _load_catalog_file(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            return yaml.safe_load(f) or {}
+        return json.load(f)
+
+
+def _normalize_entries(raw: Any) -> Dict[str, Dict[str, List[str]]]:
+    """Accept {brand: {...}} or a plain list of brand names."""
+    if isinstance(raw, list):
+        return {brand: DEFAULT_BRAND_CATALOG.get(brand, {}) for brand in raw}
+    if not isinstance(raw, dict):
+        raise ValueError("Brand catalog must be a mapping or a list of brand names")
+    return {brand: entry or {} for brand, entry in raw.items()}
+
+
+@lru_cache(maxsize=8)
+def _build_catalog(brands_env: str, catalog_path: str, catalog_json: str) -> BrandCatalog:
+    if catalog_json:
+        return BrandCatalog(_normalize_entries(json.loads(catalog_json)))
+    if catalog_path:
+        return BrandCatalog(_normalize_entries(_load_catalog_file(catalog_path)))
+    return BrandCatalog(_normalize_entries(get_brands()))
+
+
+def get_brand_catalog() -> BrandCatalog:
+    """
+    Shared, compiled brand catalog. Sources, in priority order: BRAND_CATALOG
+    (inline JSON), BRAND_CATALOG_PATH (JSON/YAML file), BRANDS (names only,
+    enriched from DEFAULT_BRAND_CATALOG). Parsing and compilation happen once
+    per distinct configuration.
+    """
+    return _build_catalog(
+        os.getenv("BRANDS", ""),
+        os.getenv("BRAND_CATALOG_PATH", ""),
+        os.getenv("BRAND_CATALOG", ""),
+    )
+
@@ -0,0 +1,104 @@
+import re
+import unicodedata
+from typing import Dict, FrozenSet, List, Tuple
+
+
+def normalize_text(text: str) -> str:
+    """Casefold and strip diacritics so 'Orïent' and 'ORIENT' compare equal."""
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+# Words, and every other non-separator character as a token of its own
+_TOKEN_RE = re.compile(r"(\w+)|[^\w\s\-]")
+
+# (text, directly follows the previous token, is a word)
+Token = Tuple[str, bool, bool]
+
+
+def _tokens(text: str) -> List[Token]:
+    """Tokens of already normalized text; spaces and hyphens only separate them."""
+    tokens = []
+    end = 0
+    for match in _TOKEN_RE.finditer(text):
+        tokens.append((match.group(), bool(tokens) and match.start() == end, match.group(1) is not None))
+        end = match.end()
+    return tokens
+
+
+def _alias_key(alias: str) -> Tuple[str, FrozenSet[int]]:
+    """
+    An alias as its characters without separators, plus the offsets where
+    it had spaces or hyphens. Those are the only places a match may have a
+    gap, and the gap is optional, so "V-Guard" also matches "v guard" and
+    "vguard".
+    """
+    key, gaps = "", set()
+    for part in re.split(r"[\s\-]+", normalize_text(alias).strip()):
+        if part:
+            if key:
+                gaps.add(len(key))
+            key += part
+    return key, frozenset(gaps)
+
+
+class BrandMatcher:
+    """
+    Brand matcher that scans a post once in time linear in its length,
+    however many brands are tracked. Aliases are looked up by the
+    characters of consecutive tokens in a dict, so they only ever match
+    whole words: "Orient" doesn't match inside "oriented". At each token
+    the longest alias wins, so "Super Fan" is preferred over "Fan".
+    """
+
+    def __init__(self, aliases: Dict[str, List[str]]):
+        self.brands = list(aliases)
+        # key -> [(allowed gap offsets, brand)]
+        self._aliases: Dict[str, List[Tuple[FrozenSet[int], str]]] = {}
+        for brand, names in aliases.items():
+            for name in [brand, *names]:
+                key, gaps = _alias_key(name)
+                if key and all(g != gaps for g, _ in self._aliases.get(key, [])):
+                    self._aliases.setdefault(key, []).append((gaps, brand))
+        # Every prefix of every alias, so a scan stops as soon as nothing can match
+        self._prefixes = {key[:i] for key in self._aliases for i in range(1, len(key) + 1)}
+
+    def _match_at(self, tokens: List[Token], start: int) -> Tuple[int, str]:
+        """(index after the longest alias starting at `start`, its brand), or (start, "")."""
+        best = (start, "")
+        key, gaps = "", set()
+        for end in range(start, len(tokens)):
+            token, glued, _ = tokens[end]
+            if end > start and not glued:
+                gaps.add(len(key))
+            key += token
+            if key not in self._prefixes:
+                break
+            # A match can't end right before a word character
+            if end + 1 < len(tokens) and tokens[end + 1][1] and tokens[end + 1][2]:
+                continue
+            for allowed, brand in self._aliases.get(key, []):
+                if gaps <= allowed:
+                    best = (end + 1, brand)
+                    break
+        return best
+
+    def find(self, text: str) -> List[str]:
+        """Brands mentioned in `text`, in tracking order, without duplicates."""
+        if not self._aliases:
+            return []
+        tokens = _tokens(normalize_text(text))
+        found = set()
+        i = 0
+        while i < len(tokens):
+            # Nor start right after one
+            if tokens[i][1] and tokens[i - 1][2]:
+                i += 1
+                continue
+            end, brand = self._match_at(tokens, i)
+            if brand:
+                found.add(brand)
+                i = end
+            else:
+                i += 1
+        return [b for b in self.brands if b in found]
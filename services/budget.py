@@ -0,0 +1,255 @@
+import contextvars
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from config import get_budget_settings
+
+# Metered resources: SerpAPI searches, YouTube Data API units, LLM tokens
+RESOURCES = ("serpapi_searches", "youtube_units", "llm_tokens")
+
+# Usage not caused by one keyword, e.g. classification batches
+SHARED = "_shared"
+
+
+class BudgetExceeded(Exception):
+    """Raised instead of making a call the budget has no room for."""
+
+    def __init__(self, resource: str):
+        super().__init__(f"{resource} budget exhausted")
+        self.resource = resource
+
+
+def _today() -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime())
+
+
+class BudgetStore:
+    """
+    SQLite ledger of usage per UTC day, resource and keyword. Today's
+    totals are also kept in memory so every run in the process charges
+    the same daily ceiling before its usage is written.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            "day TEXT NOT NULL, resource TEXT NOT NULL, keyword TEXT NOT NULL, "
+            "amount REAL NOT NULL, PRIMARY KEY (day, resource, keyword))"
+        )
+        self._conn.commit()
+        self._day: Optional[str] = None
+        self._today: Dict[str, float] = {}
+
+    def _load_today(self) -> None:
+        day = _today()
+        if day != self._day:
+            rows = self._conn.execute(
+                "SELECT resource, SUM(amount) FROM usage WHERE day = ? GROUP BY resource", (day,)
+            ).fetchall()
+            self._day, self._today = day, {resource: amount for resource, amount in rows}
+
+    def try_charge(self, resource: str, amount: float, ceiling: int) -> bool:
+        """Add `amount` to today's total unless it would pass `ceiling` (0 = unlimited)."""
+        with self._lock:
+            self._load_today()
+            spent = self._today.get(resource, 0)
+            if ceiling and amount > 0 and spent + amount > ceiling:
+                return False
+            self._today[resource] = spent + amount
+            return True
+
+    def spent_today(self, resource: str) -> float:
+        with self._lock:
+            self._load_today()
+            return self._today.get(resource, 0)
+
+    def add(self, day: str, usage: Dict[str, Dict[str, float]]) -> None:
+        """Persist {resource: {keyword: amount}} on top of what `day` already holds."""
+        rows = [
+            (day, resource, keyword, amount)
+            for resource, per_keyword in usage.items()
+            for keyword, amount in per_keyword.items()
+            if amount
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO usage (day, resource, keyword, amount) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (day, resource, keyword) DO UPDATE SET amount = amount + excluded.amount",
+                rows,
+            )
+            self._conn.commit()
+
+    def daily(self, day: str) -> Dict[str, Dict[str, float]]:
+        """{resource: {keyword: amount}} recorded for `day`."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT resource, keyword, amount FROM usage WHERE day = ?", (day,)
+            ).fetchall()
+        usage: Dict[str, Dict[str, float]] = {}
+        for resource, keyword, amount in rows:
+            usage.setdefault(resource, {})[keyword] = amount
+        return usage
+
+
+_store: Optional[BudgetStore] = None
+_store_lock = threading.Lock()
+
+
+def get_budget_store() -> BudgetStore:
+    global _store
+    path = get_budget_settings()["store_path"]
+    with _store_lock:
+        if _store is None or _store.path != path:
+            _store = BudgetStore(path)
+    return _store
+
+
+class BudgetLedger:
+    """
+    Usage of one run, per resource and keyword, checked against per-run
+    ceilings here and per-day ceilings in the shared store. A ceiling of
+    0 means unlimited.
+    """
+
+    def __init__(self, settings: Dict[str, Any], store: BudgetStore):
+        self.per_run = settings["per_run"]
+        self.per_day = settings["per_day"]
+        self.store = store
+        self.day = _today()
+        self.usage: Dict[str, Dict[str, float]] = {r: {} for r in RESOURCES}
+        self.exhausted: Dict[str, bool] = {r: False for r in RESOURCES}
+        self.degraded: Dict[str, Dict[str, int]] = {r: {} for r in RESOURCES}
+        self._lock = threading.Lock()
+
+    def spent(self, resource: str) -> float:
+        with self._lock:
+            return sum(self.usage[resource].values())
+
+    def remaining(self, resource: str) -> Optional[float]:
+        """Units left under the tighter of both ceilings; None if unlimited."""
+        limits = []
+        if self.per_run.get(resource):
+            limits.append(self.per_run[resource] - self.spent(resource))
+        if self.per_day.get(resource):
+            limits.append(self.per_day[resource] - self.store.spent_today(resource))
+        return max(0, min(limits)) if limits else None
+
+    def can_afford(self, resource: str, amount: float) -> bool:
+        remaining = self.remaining(resource)
+        return remaining is None or remaining >= amount
+
+    def try_spend(self, resource: str, amount: float, keyword: Optional[str] = None) -> bool:
+        """Charge `amount` if both ceilings have room; otherwise mark the resource exhausted."""
+        keyword = keyword or _keyword.get()
+        with self._lock:
+            ceiling = self.per_run.get(resource)
+            spent = sum(self.usage[resource].values())
+            if ceiling and amount > 0 and spent + amount > ceiling:
+                self.exhausted[resource] = True
+                return False
+            if not self.store.try_charge(resource, amount, self.per_day.get(resource)):
+                self.exhausted[resource] = True
+                return False
+            per_keyword = self.usage[resource]
+            per_keyword[keyword] = per_keyword.get(keyword, 0) + amount
+            return True
+
+    def record(self, resource: str, amount: float, keyword: Optional[str] = None) -> None:
+        """Charge usage that already happened, e.g. the real token count after a reservation."""
+        keyword = keyword or _keyword.get()
+        with self._lock:
+            self.store.try_charge(resource, amount, 0)
+            per_keyword = self.usage[resource]
+            per_keyword[keyword] = per_keyword.get(keyword, 0) + amount
+
+    def note_degraded(self, resource: str, how: str) -> None:
+        """Count a fallback taken because `resource` ran out ("cache", "skipped", ...)."""
+        with self._lock:
+            counts = self.degraded[resource]
+            counts[how] = counts.get(how, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            usage = {r: dict(per_keyword) for r, per_keyword in self.usage.items()}
+        return {
+            resource: {
+                "spent": sum(usage[resource].values()),
+                "by_keyword": usage[resource],
+                "run_limit": self.per_run.get(resource) or None,
+                "day_limit": self.per_day.get(resource) or None,
+                "spent_today": self.store.spent_today(resource),
+                "exhausted": self.exhausted[resource],
+                "degraded": dict(self.degraded[resource]),
+            }
+            for resource in RESOURCES
+        }
+
+    def flush(self) -> None:
+        with self._lock:
+            usage = {r: dict(per_keyword) for r, per_keyword in self.usage.items()}
+        try:
+            self.store.add(self.day, usage)
+        except Exception as e:
+            print(f"Budget usage write failed: {e}")
+
+
+_ledger: contextvars.ContextVar[Optional[BudgetLedger]] = contextvars.ContextVar("budget_ledger", default=None)
+_keyword: contextvars.ContextVar[str] = contextvars.ContextVar("budget_keyword", default=SHARED)
+
+
+@contextmanager
+def budget_scope() -> Iterator[BudgetLedger]:
+    """Meter every fetch and LLM call made inside this block as one run; usage is saved on exit."""
+    ledger = BudgetLedger(get_budget_settings(), get_budget_store())
+    token = _ledger.set(ledger)
+    try:
+        yield ledger
+    finally:
+        _ledger.reset(token)
+        ledger.flush()
+
+
+@contextmanager
+def keyword_scope(keyword: str) -> Iterator[None]:
+    """Attribute usage inside this block to `keyword`."""
+    token = _keyword.set(keyword)
+    try:
+        yield
+    finally:
+        _keyword.reset(token)
+
+
+def current_ledger() -> BudgetLedger:
+    # Calls outside a run still respect the daily ceilings; their usage isn't saved
+    return _ledger.get() or BudgetLedger(get_budget_settings(), get_budget_store())
+
+
+def reserve_llm_tokens(estimate: int) -> int:
+    """Reserve an LLM call's estimated tokens or raise BudgetExceeded."""
+    ledger = current_ledger()
+    if not ledger.try_spend("llm_tokens", estimate):
+        ledger.note_degraded("llm_tokens", "skipped")
+        raise BudgetExceeded("llm_tokens")
+    return estimate
+
+
+def settle_llm_tokens(reserved: int, completion: Any) -> None:
+    """Replace a reservation with the tokens the provider reported (none if the call failed)."""
+    usage = getattr(completion, "usage", None) if completion is not None else None
+    if completion is None:
+        actual = 0
+    elif usage is not None and getattr(usage, "total_tokens", None) is not None:
+        actual = usage.total_tokens
+    else:
+        actual = reserved
+    if actual != reserved:
+        current_ledger().record("llm_tokens", actual - reserved)
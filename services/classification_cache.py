@@ -0,0 +1,131 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import orjson
+import xxhash
+
+from config import get_classification_cache_settings
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+def classification_key(text: str, keywords: List[str], prompt_version: str) -> str:
+    """Hash of the normalized post text, the keyword set and the prompt version."""
+    keyword_part = "|".join(sorted({_normalize(k) for k in keywords}))
+    return xxhash.xxh3_128_hexdigest(f"{prompt_version}\x00{keyword_part}\x00{_normalize(text)}")
+
+
+class ClassificationCache:
+    """
+    SQLite-backed store of LLM classifications. Entries carry a last-used
+    timestamp; once the table grows past `max_entries` the least recently
+    used rows are evicted. Hit/miss counters accumulate for the lifetime
+    of the process.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS classifications ("
+            "key TEXT PRIMARY KEY, result BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_last_used ON classifications (last_used)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(unique), 500):
+                chunk = unique[i:i+500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, result FROM classifications WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                found.update({key: orjson.loads(result) for key, result in rows})
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE classifications SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+                self._conn.commit()
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def set_many(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO classifications (key, result, last_used) VALUES (?, ?, ?)",
+                [(key, orjson.dumps(result), now) for key, result in entries.items()],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM classifications").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM classifications WHERE key IN ("
+                "SELECT key FROM classifications ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        """Most recently used classifications, e.g. as training labels."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT result FROM classifications ORDER BY last_used DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [orjson.loads(result) for (result,) in rows]
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+_cache: Optional[ClassificationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_classification_cache() -> Optional[ClassificationCache]:
+    """Process-wide cache instance, or None when disabled."""
+    global _cache
+    settings = get_classification_cache_settings()
+    if not settings["enabled"]:
+        return None
+    with _cache_lock:
+        if _cache is None or _cache.path != settings["path"]:
+            try:
+                _cache = ClassificationCache(settings["path"], settings["max_entries"])
+            except Exception as e:
+                print(f"Classification cache unavailable: {e}")
+                return None
+    return _cache
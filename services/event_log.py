@@ -0,0 +1,37 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, List
+
+
+class EventLog:
+    """
+    Append-only list of progress events that any number of readers can
+    follow: each reader gets every event from the start, then new ones as
+    they are published, until the log is closed.
+    """
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self.closed = False
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        self.events.append(event)
+        self._notify()
+
+    def close(self) -> None:
+        self.closed = True
+        self._notify()
+
+    async def follow(self) -> AsyncIterator[Dict[str, Any]]:
+        seen = 0
+        while True:
+            while seen < len(self.events):
+                seen += 1
+                yield self.events[seen - 1]
+            if self.closed:
+                return
+            await self._changed.wait()
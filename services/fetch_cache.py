@@ -0,0 +1,210 @@
+import asyncio
+import contextvars
+import hashlib
+import os
+import threading
+import time
+from functools import wraps
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import orjson
+import zstandard
+
+from config import get_fetch_cache_settings
+from services.budget import budget_scope, current_ledger
+from services.instrumentation import record_cache
+
+
+class FetchCache:
+    """
+    On-disk cache for fetcher responses.
+
+    Each entry is one zstd-compressed orjson file named by the hash of its
+    key. File mtime doubles as the LRU clock: hits touch the file, and
+    writes evict the least recently used files once the directory exceeds
+    `max_bytes`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._compressor = zstandard.ZstdCompressor(level=10)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def _path(self, key: Tuple) -> str:
+        digest = hashlib.sha1(orjson.dumps(list(key))).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json.zst")
+
+    def get(self, key: Tuple) -> Optional[Tuple[float, Any]]:
+        """Return (fetched_at, data) or None if the key is not cached."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                entry = orjson.loads(self._decompressor.decompress(f.read()))
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Fetch cache read failed for {key}: {e}")
+            return None
+        return entry["fetched_at"], entry["data"]
+
+    def set(self, key: Tuple, data: Any) -> None:
+        path = self._path(key)
+        payload = self._compressor.compress(
+            orjson.dumps({"key": list(key), "fetched_at": time.time(), "data": data})
+        )
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+            self._evict()
+        except Exception as e:
+            print(f"Fetch cache write failed for {key}: {e}")
+
+    def _evict(self) -> None:
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".json.zst"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+_cache: Optional[FetchCache] = None
+# Reasons the fetch in progress came back partial; set per cached call
+_incomplete: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("fetch_incomplete", default=None)
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def _get_cache(settings: Dict[str, Any]) -> FetchCache:
+    global _cache
+    if _cache is None or _cache.directory != settings["dir"]:
+        _cache = FetchCache(settings["dir"], settings["max_bytes"])
+    return _cache
+
+
+def mark_incomplete(reason: str) -> None:
+    """
+    Called by a fetcher that is returning less than it was asked for
+    (a page failed, the budget ran out) so the result isn't cached as if
+    it were complete. A no-op outside a cached fetch.
+    """
+    reasons = _incomplete.get()
+    if reasons is not None:
+        reasons.append(reason)
+
+
+async def _fetch_complete(fetch: Callable[[], Awaitable[List[Dict[str, Any]]]]) -> Tuple[List[Dict[str, Any]], bool]:
+    """Run `fetch`; returns its data and whether it is complete enough to cache."""
+    reasons: List[str] = []
+    token = _incomplete.set(reasons)
+    try:
+        data = await fetch()
+    finally:
+        _incomplete.reset(token)
+    return data, bool(data) and not reasons
+
+
+# Strong references so in-flight refresh tasks aren't garbage collected
+_refresh_tasks = set()
+
+
+def _refresh_in_background(key: Tuple, fetch: Callable[[], Awaitable[List[Dict[str, Any]]]], cache: FetchCache) -> None:
+    """
+    Re-run the fetch once per key as a background task and store the
+    result. The refresh outlives the run that triggered it, so it is
+    metered by a ledger of its own that is saved when it finishes.
+    """
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    async def _run():
+        try:
+            with budget_scope():
+                data, complete = await _fetch_complete(fetch)
+            if complete:
+                await asyncio.to_thread(cache.set, key, data)
+        except Exception as e:
+            print(f"Background refresh failed for {key}: {e}")
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    task = asyncio.get_running_loop().create_task(_run())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+def cached_fetch(source: str, key_fn: Callable[..., Tuple], budget: Optional[Tuple[str, int]] = None):
+    """
+    Decorate an async fetcher with the on-disk cache. `key_fn` receives the
+    fetcher's arguments and returns the identifying part of the key.
+
+    Fresh entries are returned directly. Entries past their TTL but within
+    the stale-while-revalidate window are returned immediately while a
+    background refresh repopulates the cache. Empty results, and results
+    the fetcher flagged with mark_incomplete(), are not cached so transient
+    errors and budget cuts don't stick. Disk access runs off the event loop.
+
+    `budget` is (resource, units one fetch needs at least). When the run's
+    budget can't cover that, any cached entry is served regardless of age
+    and nothing is refreshed.
+    """
+
+    def decorator(func: Callable[..., Awaitable[List[Dict[str, Any]]]]):
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            settings = get_fetch_cache_settings()
+            if not settings["enabled"]:
+                return await func(*args, **kwargs)
+
+            cache = _get_cache(settings)
+            key = (source, *key_fn(*args, **kwargs))
+            ttl = settings["ttl"].get(source, settings["default_ttl"])
+
+            cached = await asyncio.to_thread(cache.get, key)
+            starved = budget is not None and not current_ledger().can_afford(*budget)
+            if cached is not None:
+                fetched_at, data = cached
+                age = time.time() - fetched_at
+                if age <= ttl:
+                    record_cache(f"fetch:{source}", "hit")
+                    return data
+                if starved:
+                    record_cache(f"fetch:{source}", "stale")
+                    current_ledger().note_degraded(budget[0], "cache")
+                    return data
+                if age <= ttl + settings["stale_while_revalidate"]:
+                    record_cache(f"fetch:{source}", "stale")
+                    _refresh_in_background(key, lambda: func(*args, **kwargs), cache)
+                    return data
+
+            record_cache(f"fetch:{source}", "miss")
+            data, complete = await _fetch_complete(lambda: func(*args, **kwargs))
+            if complete:
+                await asyncio.to_thread(cache.set, key, data)
+            return data
+
+        return wrapper
+
+    return decorator
@@ -1,44 +1,169 @@
-import requests
-from typing import List, Dict, Any
+import asyncio
+from typing import List, Dict, Any, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
 import os
 from langsmith import traceable
+from config import get_google_settings
+from services.budget import current_ledger
+from services.fetch_cache import cached_fetch, mark_incomplete
+from services.instrumentation import instrumented_call
+from services.post_table import parse_post_date
+from services.resources import get_resources
 
+SERPAPI_URL = "https://serpapi.com/search"
+PAGE_SIZE = 10
+
+# Extra SerpAPI params and the result lists to read, per vertical
+VERTICALS = {
+    "web": ({}, ("organic_results", "news_results", "discussions_and_forums")),
+    "news": ({"tbm": "nws"}, ("news_results",)),
+    "videos": ({"tbm": "vid"}, ("video_results",)),
+    "discussions": ({"udm": "18"}, ("organic_results", "discussions_and_forums")),
+}
+
+TRACKING_PREFIXES = ("utm_",)
+TRACKING_PARAMS = {"gclid", "fbclid", "ref", "ved", "sa", "usg", "ei"}
+
+
+def canonical_url(url: str) -> str:
+    """URL with scheme/host case, www., fragments, tracking params and trailing slashes normalized away."""
+    if not url:
+        return url
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    query = urlencode(sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    ))
+    return urlunsplit(("https", host, parts.path.rstrip("/") or "/", query, ""))
+
+
+def _to_post(item: Dict[str, Any], vertical: str) -> Dict[str, Any]:
+    title = item.get("title", "")
+    snippet = item.get("snippet") or item.get("description", "")
+    link = item.get("link") or item.get("source")
+    source = item.get("source")
+    if isinstance(source, dict):
+        source = source.get("name")
+    return {
+        "platform": "Google",
+        "text": f"{title} - {snippet}",
+        "meta": {
+            "likes": 0,
+            "comments": 0,
+            "shares": 0,
+            "views": 0,
+            "url": link,
+            # SerpAPI dates can be relative ("3 days ago"); pin them to a day now
+            "date": parse_post_date(item.get("date")) or item.get("date"),
+            "id": item.get("cacheId") or canonical_url(link) or item.get("position"),
+            "author": source or item.get("displayed_link"),
+            "vertical": vertical,
+        },
+    }
+
+
+async def _fetch_page(keyword: str, gl: str, vertical: str, page: int) -> List[Dict[str, Any]]:
+    """
+    One SerpAPI result page of one vertical; [] if the request fails or the
+    budget is spent. The search is reserved before the request and handed
+    back if it fails, so only successful responses are charged.
+    """
+    extra, result_keys = VERTICALS[vertical]
+    params = {
+        "engine": "google",
+        "q": keyword,
+        "api_key": os.getenv("SERPAPI_KEY"),
+        "gl": gl,
+        "num": PAGE_SIZE,
+        "start": page * PAGE_SIZE,
+        **extra,
+    }
+    ledger = current_ledger()
+    resources = get_resources()
+    try:
+        # One limiter for every SerpAPI request in flight, whatever the keyword
+        async with resources.limiter("serpapi", get_google_settings()["page_concurrency"]):
+            if not ledger.try_spend("serpapi_searches", 1):
+                ledger.note_degraded("serpapi_searches", "skipped")
+                mark_incomplete("budget")
+                return []
+            try:
+                r = await resources.http.get(SERPAPI_URL, params=params)
+                r.raise_for_status()
+                data = r.json()
+            except BaseException:
+                ledger.record("serpapi_searches", -1)
+                raise
+    except Exception as e:
+        print(f"SerpAPI {vertical} page {page + 1} failed for keyword '{keyword}': {e}")
+        mark_incomplete("error")
+        return []
+    return [
+        _to_post(item, vertical)
+        for key in result_keys
+        for item in data.get(key) or []
+        if isinstance(item, dict)
+    ]
+
+
+@cached_fetch(
+    "google",
+    lambda keyword, top_n=20, gl="in", pages=1, verticals=("web",): (keyword, top_n, gl, pages, ",".join(verticals)),
+    budget=("serpapi_searches", 1),
+)
+# Below the cache so only real fetches are timed and counted
+@instrumented_call("fetch", "google")
 @traceable(run_type="tool", name="fetch_google_serpapi")
-def fetch_google_serpapi(keyword: str, top_n: int = 20) -> List[Dict[str, Any]]:
+async def fetch_google_serpapi(
+    keyword: str,
+    top_n: int = 20,
+    gl: str = "in",
+    pages: int = 1,
+    verticals: Tuple[str, ...] = ("web",),
+) -> List[Dict[str, Any]]:
+    """
+    Fetch `pages` result pages of every vertical (web, news, videos,
+    discussions) concurrently. Results are deduplicated by canonical URL
+    as pages arrive, keeping the best-ranked copy. `top_n` applies per
+    page of each vertical, so at most top_n * pages * len(verticals)
+    posts come back; with the defaults (one web page) that is top_n.
+    Pages the SerpAPI budget can't cover are skipped.
+    """
     try:
-        url = "https://serpapi.com/search"
         serpapi_key = os.getenv("SERPAPI_KEY")
         if not serpapi_key:
             raise RuntimeError("Missing SERPAPI_KEY in environment")
-        params = {"engine": "google", "q": keyword, "api_key": serpapi_key, "gl":"in"}
-        r = requests.get(url, params=params, timeout=30)
-        r.raise_for_status()
-        data = r.json()
-
-        results = []
-        for item in data.get("organic_results", []) + data.get("news_results", []):
-            title = item.get("title", "")
-            snippet = item.get("snippet") or item.get("description", "")
-            link = item.get("link") or item.get("source")
-            results.append(
-                {
-                    "platform": "Google",
-                    "text": f"{title} - {snippet}",
-                    "meta": {
-                        "likes": 0,
-                        "comments": 0,
-                        "shares": 0,
-                        "views": 0,
-                        "url": link,
-                        "date": item.get("date"),
-                        "id": item.get("position") or item.get("cacheId") or link,
-                        "author": item.get("source") or item.get("displayed_link"),
-                    },
-                }
-            )
-            if len(results) >= top_n:
-                break
-        return results
+
+        verticals = [v for v in verticals if v in VERTICALS] or ["web"]
+
+        async def _ranked(v_rank: int, vertical: str, page: int):
+            return v_rank, page, await _fetch_page(keyword, gl, vertical, page)
+
+        # Owned here so a caller's cancellation (e.g. its deadline) stops every page
+        tasks = [
+            asyncio.ensure_future(_ranked(v_rank, vertical, page))
+            for v_rank, vertical in enumerate(verticals)
+            for page in range(pages)
+        ]
+
+        best: Dict[str, Tuple[Tuple[int, int, int], Dict[str, Any]]] = {}
+        try:
+            for future in asyncio.as_completed(tasks):
+                v_rank, page, posts = await future
+                for position, post in enumerate(posts):
+                    key = canonical_url(post["meta"]["url"]) or post["text"].strip().lower()
+                    rank = (page, v_rank, position)
+                    if key not in best or rank < best[key][0]:
+                        best[key] = (rank, post)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        results = [post for _, post in sorted(best.values(), key=lambda entry: entry[0])]
+        return results[: top_n * pages * len(verticals)]
 
     except Exception as e:
         print(f"Error in fetch_google_serpapi for keyword '{keyword}': {e}")
@@ -0,0 +1,305 @@
+import contextvars
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+ITEM_BUCKETS = (0, 1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    """Monotonic count per label set, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...]):
+        self.name, self.help, self.labelnames = name, help, labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label set, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...], buckets: Tuple[float, ...]):
+        self.name, self.help, self.labelnames, self.buckets = name, help, labelnames, buckets
+        # labels -> (per-bucket counts with a trailing +Inf slot, sum, count)
+        self._values: Dict[Tuple[str, ...], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, *labels: str, value: float) -> None:
+        with self._lock:
+            entry = self._values.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            entry[0][bisect_left(self.buckets, value)] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._values.items()):
+                cumulative = 0
+                for bound, n in zip((*self.buckets, "+Inf"), counts):
+                    cumulative += n
+                    le = f'le="{bound}"'
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+NODE_SECONDS = Histogram("pipeline_node_seconds", "Wall time of a pipeline node", ("node",), SECONDS_BUCKETS)
+NODE_CPU_SECONDS = Histogram(
+    "pipeline_node_cpu_seconds",
+    "CPU time of an offloaded (synchronous) pipeline node, measured on its worker thread",
+    ("node",),
+    SECONDS_BUCKETS,
+)
+NODE_ITEMS = Histogram("pipeline_node_items", "Posts going into and out of a node", ("node", "direction"), ITEM_BUCKETS)
+NODE_ERRORS = Counter("pipeline_node_errors_total", "Nodes that raised", ("node",))
+CALL_SECONDS = Histogram("external_call_seconds", "Wall time of a fetcher or LLM call", ("kind", "name"), SECONDS_BUCKETS)
+CALL_ITEMS = Histogram("external_call_items", "Items returned by a fetcher call", ("kind", "name"), ITEM_BUCKETS)
+CALLS = Counter("external_calls_total", "Fetcher and LLM calls by outcome", ("kind", "name", "outcome"))
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by result (hit, stale, miss)", ("cache", "result"))
+RETRIES = Counter("llm_retries_total", "LLM call attempts that were retried", ("name",))
+HTTP_BYTES = Counter("http_bytes_total", "HTTP body bytes by host and direction", ("host", "direction"))
+
+REGISTRY = (
+    NODE_SECONDS, NODE_CPU_SECONDS, NODE_ITEMS, NODE_ERRORS,
+    CALL_SECONDS, CALL_ITEMS, CALLS, CACHE_LOOKUPS, RETRIES, HTTP_BYTES,
+)
+
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+class RunStats:
+    """Timing summary of one run: nodes in order plus totals per call, cache and host."""
+
+    def __init__(self):
+        self.nodes: List[Dict[str, Any]] = []
+        self.calls: Dict[str, Dict[str, Any]] = {}
+        self.cache: Dict[str, Dict[str, int]] = {}
+        self.retries: Dict[str, int] = {}
+        self.bytes: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def add_node(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            self.nodes.append(record)
+
+    def add_call(self, name: str, seconds: float, ok: bool, items: Optional[int]) -> None:
+        with self._lock:
+            call = self.calls.setdefault(name, {"calls": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0, "items": 0})
+            call["calls"] += 1
+            call["errors"] += 0 if ok else 1
+            call["seconds"] += seconds
+            call["max_seconds"] = max(call["max_seconds"], seconds)
+            call["items"] += items or 0
+
+    def add_count(self, table: str, key: str, label: str, amount: int = 1) -> None:
+        with self._lock:
+            target = getattr(self, table).setdefault(key, {})
+            target[label] = target.get(label, 0) + amount
+
+    def add_retry(self, name: str) -> None:
+        with self._lock:
+            self.retries[name] = self.retries.get(name, 0) + 1
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "total_seconds": round(time.perf_counter() - self._started, 4),
+                "nodes": [dict(n) for n in self.nodes],
+                "calls": {
+                    name: {**c, "seconds": round(c["seconds"], 4), "max_seconds": round(c["max_seconds"], 4)}
+                    for name, c in self.calls.items()
+                },
+                "cache": {k: dict(v) for k, v in self.cache.items()},
+                "retries": dict(self.retries),
+                "bytes": {k: dict(v) for k, v in self.bytes.items()},
+            }
+
+
+_run: contextvars.ContextVar[Optional[RunStats]] = contextvars.ContextVar("run_stats", default=None)
+
+
+@contextmanager
+def run_stats() -> Iterator[RunStats]:
+    """Collect the timing summary of every node and call made inside this block."""
+    stats = RunStats()
+    token = _run.set(stats)
+    try:
+        yield stats
+    finally:
+        _run.reset(token)
+
+
+def _item_count(state: Any) -> Optional[int]:
+    """Posts currently flowing through the pipeline state, from its most processed form."""
+    if not isinstance(state, dict):
+        return None
+    for key in ("post_table", "tagged_data", "clean_data", "raw_data"):
+        if state.get(key) is not None:
+            try:
+                return len(state[key])
+            except TypeError:
+                return None
+    return 0
+
+
+def _record_node(name: str, wall: float, cpu: Optional[float], items_in: Optional[int], items_out: Optional[int], ok: bool) -> None:
+    NODE_SECONDS.observe(name, value=wall)
+    if cpu is not None:
+        NODE_CPU_SECONDS.observe(name, value=cpu)
+    for direction, items in (("in", items_in), ("out", items_out)):
+        if items is not None:
+            NODE_ITEMS.observe(name, direction, value=items)
+    if not ok:
+        NODE_ERRORS.inc(name)
+    stats = _run.get()
+    if stats is not None:
+        stats.add_node({
+            "node": name,
+            "seconds": round(wall, 4),
+            "cpu_seconds": round(cpu, 4) if cpu is not None else None,
+            "items_in": items_in,
+            "items_out": items_out,
+            "ok": ok,
+        })
+
+
+def instrument_node(name: str, node: Callable[[Dict[str, Any]], Any]) -> Callable:
+    """
+    Wrap a pipeline node to record wall time, CPU time and posts in/out.
+    Synchronous nodes stay synchronous so they can still be offloaded, and
+    their CPU time is that of the thread they run on. Async nodes share the
+    loop with other runs, so no CPU time is recorded for them.
+    """
+    if inspect.iscoroutinefunction(node):
+        async def run(state: Dict[str, Any]) -> Dict[str, Any]:
+            items_in = _item_count(state)
+            start = time.perf_counter()
+            ok, result = False, None
+            try:
+                result = await node(state)
+                ok = True
+                return result
+            finally:
+                _record_node(name, time.perf_counter() - start, None,
+                             items_in, _item_count(result) if ok else None, ok)
+    else:
+        def run(state: Dict[str, Any]) -> Dict[str, Any]:
+            items_in = _item_count(state)
+            start, cpu_start = time.perf_counter(), time.thread_time()
+            ok, result = False, None
+            try:
+                result = node(state)
+                ok = True
+                return result
+            finally:
+                _record_node(name, time.perf_counter() - start, time.thread_time() - cpu_start,
+                             items_in, _item_count(result) if ok else None, ok)
+
+    run.__name__ = node.__name__
+    return run
+
+
+def instrumented_call(kind: str, name: str):
+    """Decorate an async fetcher ("fetch") or LLM call ("llm") to record latency, outcome and item count."""
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            ok, items = False, None
+            try:
+                result = await func(*args, **kwargs)
+                ok = True
+                if isinstance(result, (list, dict)):
+                    items = len(result)
+                return result
+            finally:
+                seconds = time.perf_counter() - start
+                CALL_SECONDS.observe(kind, name, value=seconds)
+                CALLS.inc(kind, name, "ok" if ok else "error")
+                if items is not None and kind == "fetch":
+                    CALL_ITEMS.observe(kind, name, value=items)
+                stats = _run.get()
+                if stats is not None:
+                    stats.add_call(f"{kind}:{name}", seconds, ok, items)
+
+        return wrapper
+
+    return decorator
+
+
+def record_cache(cache: str, result: str, amount: int = 1) -> None:
+    """Count `amount` lookups of `cache` that ended as `result` (hit, stale or miss)."""
+    if amount <= 0:
+        return
+    CACHE_LOOKUPS.inc(cache, result, amount=amount)
+    stats = _run.get()
+    if stats is not None:
+        stats.add_count("cache", cache, result, amount)
+
+
+def record_retry(name: str) -> None:
+    RETRIES.inc(name)
+    stats = _run.get()
+    if stats is not None:
+        stats.add_retry(name)
+
+
+def _record_bytes(host: str, direction: str, amount: int) -> None:
+    if amount:
+        HTTP_BYTES.inc(host, direction, amount=amount)
+        stats = _run.get()
+        if stats is not None:
+            stats.add_count("bytes", host, direction, amount)
+
+
+async def _on_request(request: httpx.Request) -> None:
+    try:
+        _record_bytes(request.url.host, "sent", len(request.content))
+    except httpx.RequestNotRead:
+        pass
+
+
+async def _on_response(response: httpx.Response) -> None:
+    # Non-streamed bodies are read anyway; reading here lets us count them
+    await response.aread()
+    _record_bytes(response.request.url.host, "received", len(response.content))
+
+
+# Pass as httpx's event_hooks to count the bytes a client transfers
+HTTP_EVENT_HOOKS = {"request": [_on_request], "response": [_on_response]}
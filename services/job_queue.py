@@ -0,0 +1,204 @@
+import asyncio
+import uuid
+from collections import Counter
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from services.event_log import EventLog
+from services.job_store import FINISHED_STATUSES, JobStore
+from services.progress import source_view
+
+# Async generator yielding the pipeline's progress / complete / error events
+Runner = Callable[[Dict[str, Any]], AsyncIterator[Dict[str, Any]]]
+
+
+class TenantLimitError(Exception):
+    """Raised when a tenant already has too many jobs waiting."""
+
+
+class Job(EventLog):
+    """In-memory state of a queued or running job, including its event log."""
+
+    def __init__(self, job_id: str, tenant: str, request: Dict[str, Any]):
+        super().__init__()
+        self.id = job_id
+        self.tenant = tenant
+        self.request = request
+        self.status = "queued"
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+
+class JobManager:
+    """
+    Runs analyses in the background, decoupled from the HTTP request that
+    submitted them. A fixed pool of `workers` takes queued jobs in order,
+    skipping jobs of tenants already running `per_tenant` jobs, so one
+    tenant can't occupy every worker. Status, progress and results are
+    persisted in a JobStore.
+    """
+
+    def __init__(self, store: JobStore, runner: Runner, settings: Dict[str, Any]):
+        self.store = store
+        self.runner = runner
+        self.workers = settings["workers"]
+        self.per_tenant = settings["per_tenant"]
+        self.max_queued_per_tenant = settings["max_queued_per_tenant"]
+        self._jobs: Dict[str, Job] = {}
+        self._pending: List[Job] = []
+        self._running = Counter()
+        # Queue slots taken by submissions whose store write hasn't finished
+        self._reserved = Counter()
+        self._cond: Optional[asyncio.Condition] = None
+        self._worker_tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        interrupted = await asyncio.to_thread(self.store.mark_interrupted)
+        if interrupted:
+            print(f"Marked {interrupted} unfinished jobs from a previous run as failed")
+        self._cond = asyncio.Condition()
+        self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._worker_tasks:
+            task.cancel()
+        for job in list(self._jobs.values()):
+            if job.task is not None:
+                job.task.cancel()
+        await asyncio.gather(
+            *self._worker_tasks,
+            *(job.task for job in self._jobs.values() if job.task is not None),
+            return_exceptions=True,
+        )
+
+    async def submit(self, tenant: str, request: Dict[str, Any]) -> str:
+        async with self._cond:
+            queued = sum(1 for job in self._pending if job.tenant == tenant) + self._reserved[tenant]
+            if queued >= self.max_queued_per_tenant:
+                raise TenantLimitError(f"Tenant '{tenant}' already has {queued} queued jobs")
+            self._reserved[tenant] += 1
+
+        job = Job(uuid.uuid4().hex, tenant, request)
+        try:
+            await asyncio.to_thread(self.store.create, job.id, tenant, request)
+        except BaseException:
+            async with self._cond:
+                self._reserved[tenant] -= 1
+            raise
+        self._jobs[job.id] = job
+        async with self._cond:
+            self._reserved[tenant] -= 1
+            self._pending.append(job)
+            self._cond.notify_all()
+        return job.id
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def list_jobs(self, tenant: str) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.store.list_jobs, tenant)
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job. False if it's unknown or already finished."""
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        if job.task is not None:
+            job.task.cancel()
+            return True
+        async with self._cond:
+            if job in self._pending:
+                self._pending.remove(job)
+        await self._finish(job, "cancelled", {"type": "cancelled"})
+        return True
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Progress events of a live job, or the stored outcome of a finished one."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            async for event in job.follow():
+                yield event
+            return
+
+        stored = await asyncio.to_thread(self.store.get, job_id)
+        if stored is None:
+            return
+        if stored["progress"]:
+            yield stored["progress"]
+        if stored["status"] == "completed":
+            result = stored["result"] or {}
+            # The live "posts" events aren't kept; replay the final sources instead
+            yield {"type": "posts", "source": None, "keyword": None,
+                   "posts": [source_view(p) for p in result.get("sources", [])]}
+            yield {"type": "complete", **result}
+        elif stored["status"] == "cancelled":
+            yield {"type": "cancelled"}
+        else:
+            yield {"type": "error", "message": stored["error"]}
+
+    async def _next_job(self) -> Job:
+        async with self._cond:
+            while True:
+                for job in self._pending:
+                    if self._running[job.tenant] < self.per_tenant:
+                        self._pending.remove(job)
+                        self._running[job.tenant] += 1
+                        return job
+                await self._cond.wait()
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._next_job()
+            try:
+                if job.finished:
+                    continue
+                job.task = asyncio.create_task(self._run(job))
+                # wait() doesn't propagate the job's own cancellation to the worker
+                await asyncio.wait({job.task})
+                if not job.finished:
+                    # Cancelled before it got to run
+                    await self._finish(job, "cancelled", {"type": "cancelled"})
+            finally:
+                async with self._cond:
+                    self._running[job.tenant] -= 1
+                    self._cond.notify_all()
+
+    async def _run(self, job: Job) -> None:
+        job.status = "running"
+        await asyncio.to_thread(self.store.update, job.id, status="running")
+        try:
+            async for event in self.runner(job.request):
+                if event["type"] == "complete":
+                    result = {k: v for k, v in event.items() if k != "type"}
+                    await asyncio.to_thread(self.store.update, job.id, result=result)
+                    await self._finish(job, "completed", event)
+                    return
+                elif event["type"] == "error":
+                    await self._finish(job, "failed", event, error=event.get("message"))
+                    return
+                elif event["type"] == "cancelled":
+                    await self._finish(job, "cancelled", event)
+                    return
+                else:
+                    # Progress and partial results; only the step status is persisted
+                    job.publish(event)
+                    if event["type"] == "progress":
+                        await asyncio.to_thread(self.store.update, job.id, progress=event)
+            await self._finish(job, "failed", {"type": "error", "message": "no result"}, error="no result")
+        except asyncio.CancelledError:
+            await self._finish(job, "cancelled", {"type": "cancelled"})
+            raise
+        except Exception as e:
+            print(f"Job {job.id} failed: {e}")
+            await self._finish(job, "failed", {"type": "error", "message": str(e)}, error=str(e))
+
+    async def _finish(self, job: Job, status: str, event: Dict[str, Any], error: Optional[str] = None) -> None:
+        job.status = status
+        # Persist on a thread that outlives the cancellation of this task
+        await asyncio.shield(asyncio.to_thread(self.store.update, job.id, status=status, error=error))
+        job.publish(event)
+        job.close()
+        # Finished jobs are served from the store from now on
+        self._jobs.pop(job.id, None)
@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import orjson
+
+# Statuses a job can no longer leave
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class JobStore:
+    """
+    SQLite store of analysis jobs: the request, current status, last
+    progress event and, once finished, the result or error. Results are
+    kept so they can be served again without recomputation.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, tenant TEXT NOT NULL, status TEXT NOT NULL, "
+            "request BLOB NOT NULL, progress BLOB, result BLOB, error TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_tenant ON jobs (tenant, status)")
+        self._conn.commit()
+
+    def create(self, job_id: str, tenant: str, request: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, tenant, status, request, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, tenant, orjson.dumps(request), now, now),
+            )
+            self._conn.commit()
+
+    def update(
+        self,
+        job_id: str,
+        status: Optional[str] = None,
+        progress: Optional[Dict[str, Any]] = None,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        fields, values = ["updated_at = ?"], [time.time()]
+        if status is not None:
+            fields.append("status = ?")
+            values.append(status)
+        if progress is not None:
+            fields.append("progress = ?")
+            values.append(orjson.dumps(progress))
+        if result is not None:
+            fields.append("result = ?")
+            values.append(orjson.dumps(result))
+        if error is not None:
+            fields.append("error = ?")
+            values.append(error)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {', '.join(fields)} WHERE id = ?", [*values, job_id])
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, tenant, status, request, progress, result, error, created_at, updated_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "tenant": row[1],
+            "status": row[2],
+            "request": orjson.loads(row[3]),
+            "progress": orjson.loads(row[4]) if row[4] else None,
+            "result": orjson.loads(row[5]) if row[5] else None,
+            "error": row[6],
+            "created_at": row[7],
+            "updated_at": row[8],
+        }
+
+    def mark_interrupted(self) -> int:
+        """Fail jobs left queued or running by a previous process."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'failed', error = 'interrupted by server restart', updated_at = ? "
+                f"WHERE status NOT IN ({','.join('?' * len(FINISHED_STATUSES))})",
+                (time.time(), *FINISHED_STATUSES),
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def list_jobs(self, tenant: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs of a tenant, without their results."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, status, created_at, updated_at FROM jobs "
+                "WHERE tenant = ? ORDER BY created_at DESC LIMIT ?",
+                (tenant, limit),
+            ).fetchall()
+        return [
+            {"id": r[0], "status": r[1], "created_at": r[2], "updated_at": r[3]}
+            for r in rows
+        ]
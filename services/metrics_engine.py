@@ -0,0 +1,158 @@
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from services.post_table import PostTable, ENGAGEMENT_FIELDS, SENTIMENT_CLASSES
+
+UNKNOWN = "unknown"
+DIMENSIONS = ("platform", "keyword", "author", "time")
+
+# Per-(group, brand) counters. All of them are sums, so counts from
+# different post sets can be merged by adding (or removed by subtracting).
+COUNT_FIELDS = ("mentions", *SENTIMENT_CLASSES, *ENGAGEMENT_FIELDS)
+
+GroupCounts = Dict[Tuple[str, str], np.ndarray]
+
+
+def _share(values: np.ndarray) -> np.ndarray:
+    """Percentage share along the last axis, zeros where the total is zero."""
+    totals = values.sum(axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = np.where(totals > 0, values / np.where(totals > 0, totals, 1) * 100, 0.0)
+    return np.round(shares, 2)
+
+
+def post_contributions(table: PostTable) -> np.ndarray:
+    """(n, brands, COUNT_FIELDS) counters each post adds to every group it belongs to."""
+    mask = table.brand_mask.astype(np.int64)
+    sentiments = np.stack(
+        [table.brand_sentiment == c for c in range(len(SENTIMENT_CLASSES))], axis=2
+    ).astype(np.int64)
+    engagement = mask[:, :, None] * table.engagement[:, None, :]
+    return np.concatenate([mask[:, :, None], sentiments, engagement], axis=2)
+
+
+def _scatter(codes: np.ndarray, size: int, values: np.ndarray) -> np.ndarray:
+    out = np.zeros((size, *values.shape[1:]), dtype=np.int64)
+    np.add.at(out, codes, values)
+    return out
+
+
+def group_counts(table: PostTable) -> GroupCounts:
+    """
+    Group-by over the post table in one pass per dimension: the overall
+    rollup, platform, keyword, author and day. Single-valued dimensions
+    are scatter-adds over integer codes; keywords (several per post) are a
+    mask product. Time is always counted per day and re-bucketed on output.
+    """
+    values = post_contributions(table)
+    counts: GroupCounts = {("all", "all"): values.sum(axis=0)}
+
+    for dimension, codes, vocab in (
+        ("platform", table.platform_codes, table.platforms),
+        ("author", table.author_codes, table.authors),
+    ):
+        for name, row in zip(vocab, _scatter(codes, len(vocab), values)):
+            counts[(dimension, str(name or UNKNOWN))] = row
+
+    by_keyword = np.einsum("nk,nbf->kbf", table.keyword_mask.astype(np.int64), values)
+    for name, row in zip(table.keywords, by_keyword):
+        counts[("keyword", name)] = row
+
+    days = np.where(
+        np.isnat(table.dates), UNKNOWN, np.datetime_as_string(table.dates, unit="D")
+    )
+    day_vocab, day_codes = np.unique(days, return_inverse=True)
+    for name, row in zip(day_vocab.tolist(), _scatter(day_codes.reshape(-1), len(day_vocab), values)):
+        counts[("time", name)] = row
+
+    return counts
+
+
+def merge_counts(base: GroupCounts, other: GroupCounts, sign: int = 1) -> GroupCounts:
+    """Add (sign=1) or subtract (sign=-1) `other` into a copy of `base`."""
+    merged = {key: row.copy() for key, row in base.items()}
+    for key, row in other.items():
+        if key in merged:
+            merged[key] += sign * row
+        else:
+            merged[key] = sign * row
+    return merged
+
+
+def _time_bucket(day: str, bucket: str) -> str:
+    if day == UNKNOWN or bucket == "day":
+        return day
+    d = date.fromisoformat(day)
+    if bucket == "week":
+        return (d - timedelta(days=d.weekday())).isoformat()
+    return d.replace(day=1).isoformat()
+
+
+def _brand_metrics(counts: np.ndarray, brands: List[str], only_mentioned: bool = False) -> Dict[str, Any]:
+    """The state["metrics"] shape for one group's (brands, COUNT_FIELDS) counters."""
+    mentions = counts[:, 0]
+    sentiments = counts[:, 1:1 + len(SENTIMENT_CLASSES)]
+    engagement = counts[:, 1 + len(SENTIMENT_CLASSES):]
+
+    sov = _share(mentions)
+    spv = _share(sentiments[:, SENTIMENT_CLASSES.index("positive")])
+    eng_share = _share(engagement.sum(axis=1))
+
+    results = {}
+    for b, brand in enumerate(brands):
+        if only_mentioned and mentions[b] == 0:
+            continue
+        results[brand] = {
+            "mentions": int(mentions[b]),
+            "sov_percent": float(sov[b]),
+            "sentiment": dict(zip(SENTIMENT_CLASSES, sentiments[b].tolist())),
+            "spv_percent": float(spv[b]),
+            "engagement": dict(zip(ENGAGEMENT_FIELDS, engagement[b].tolist())),
+            "engagement_share_percent": float(eng_share[b]),
+        }
+    return results
+
+
+def metrics_from_counts(counts: GroupCounts, brands: List[str], settings: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    Return (rollup, breakdowns). The rollup keeps the state["metrics"]
+    shape; breakdowns map dimension -> group -> brand metrics, listing only
+    brands mentioned in that group. Authors are limited to the top
+    `top_authors` by mentions and days are rolled up to `time_bucket`.
+    """
+    grouped = defaultdict(dict)
+    for (dimension, name), row in counts.items():
+        if dimension == "time":
+            name = _time_bucket(name, settings["time_bucket"])
+            if name in grouped["time"]:
+                row = grouped["time"][name] + row
+        grouped[dimension][name] = row
+
+    authors = sorted(
+        (name for name, row in grouped["author"].items() if row[:, 0].sum() > 0),
+        key=lambda name: -grouped["author"][name][:, 0].sum(),
+    )[: settings["top_authors"]]
+
+    empty = np.zeros((len(brands), len(COUNT_FIELDS)), dtype=np.int64)
+    rollup = _brand_metrics(grouped["all"].get("all", empty), brands)
+    breakdowns = {}
+    for dimension in DIMENSIONS:
+        if dimension == "author":
+            names = authors
+        elif dimension == "time":
+            names = sorted(grouped["time"])
+        else:
+            names = list(grouped[dimension])
+        breakdowns[dimension] = {
+            name: _brand_metrics(grouped[dimension][name], brands, only_mentioned=True)
+            for name in names
+        }
+    return rollup, breakdowns
+
+
+def compute_metrics(table: PostTable, settings: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """Rollup and breakdowns for the posts in `table`."""
+    return metrics_from_counts(group_counts(table), table.brands, settings)
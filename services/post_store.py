@@ -0,0 +1,159 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import orjson
+import xxhash
+
+from config import get_post_store_path
+from services.metrics_engine import COUNT_FIELDS, GroupCounts
+
+
+def post_key(post: Dict[str, Any]) -> str:
+    """Stable id for a post across runs: platform plus url, falling back to id or text."""
+    meta = post.get("meta", {})
+    ident = meta.get("url") or meta.get("id") or xxhash.xxh3_64_hexdigest(post.get("text", ""))
+    return f"{post.get('platform')}:{ident}"
+
+
+def content_hash(post: Dict[str, Any]) -> str:
+    """Hash of what the expensive nodes look at; engagement changes don't count."""
+    return xxhash.xxh3_64_hexdigest(post.get("text", ""))
+
+
+class PostStore:
+    """
+    SQLite store for incremental runs. Per scope (keyword set + brand
+    catalog + prompt version) it keeps every processed post record and
+    the running group counts those records add up to.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS posts ("
+            "scope TEXT NOT NULL, post_id TEXT NOT NULL, content_hash TEXT NOT NULL, "
+            "record BLOB NOT NULL, updated_at REAL NOT NULL, PRIMARY KEY (scope, post_id))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS aggregates ("
+            "scope TEXT PRIMARY KEY, brands BLOB NOT NULL, counts BLOB NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _read_posts(self, scope: str, post_ids: Optional[List[str]]) -> Dict[str, Dict[str, Any]]:
+        if post_ids is None:
+            rows = self._conn.execute(
+                "SELECT post_id, content_hash, record FROM posts WHERE scope = ?", (scope,)
+            ).fetchall()
+        else:
+            rows = []
+            unique = list(dict.fromkeys(post_ids))
+            for i in range(0, len(unique), 500):
+                chunk = unique[i:i+500]
+                placeholders = ",".join("?" * len(chunk))
+                rows += self._conn.execute(
+                    f"SELECT post_id, content_hash, record FROM posts "
+                    f"WHERE scope = ? AND post_id IN ({placeholders})",
+                    [scope, *chunk],
+                ).fetchall()
+        return {
+            post_id: {"content_hash": digest, "record": orjson.loads(record)}
+            for post_id, digest, record in rows
+        }
+
+    def _read_counts(self, scope: str, brands: List[str]) -> GroupCounts:
+        row = self._conn.execute(
+            "SELECT brands, counts FROM aggregates WHERE scope = ?", (scope,)
+        ).fetchone()
+        if row is None or orjson.loads(row[0]) != list(brands):
+            return {}
+        return {
+            tuple(key.split("\x1f", 1)): np.array(values, dtype=np.int64).reshape(len(brands), len(COUNT_FIELDS))
+            for key, values in orjson.loads(row[1]).items()
+        }
+
+    def get_posts(self, scope: str, post_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """{post_id: {"content_hash", "record"}} for the ids already stored."""
+        with self._lock:
+            return self._read_posts(scope, post_ids)
+
+    def all_posts(self, scope: str) -> Dict[str, Dict[str, Any]]:
+        """{post_id: record} for every post stored under this scope."""
+        with self._lock:
+            found = self._read_posts(scope, None)
+        return {post_id: stored["record"] for post_id, stored in found.items()}
+
+    def get_counts(self, scope: str, brands: List[str]) -> GroupCounts:
+        """Running group counts, empty if none exist for this brand order."""
+        with self._lock:
+            return self._read_counts(scope, brands)
+
+    def update(
+        self,
+        scope: str,
+        post_ids: Optional[List[str]],
+        brands: List[str],
+        merge: Callable[[Dict[str, Dict[str, Any]], GroupCounts], Tuple[Dict[str, Dict[str, Any]], GroupCounts]],
+    ) -> GroupCounts:
+        """
+        Read-modify-write of one scope as a single IMMEDIATE transaction.
+        `merge` gets the stored {post_id: record} for `post_ids` (every post
+        if None) and the running counts as they are now, and returns the
+        records to upsert and the new counts. Runs in this process are
+        serialized by the lock, other processes by SQLite's write lock, so
+        no run merges against counts another run is about to replace.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                stored = self._read_posts(scope, post_ids)
+                records, counts = merge(
+                    {post_id: found["record"] for post_id, found in stored.items()},
+                    self._read_counts(scope, brands),
+                )
+                now = time.time()
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO posts (scope, post_id, content_hash, record, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (scope, post_id, content_hash(record), orjson.dumps(record), now)
+                        for post_id, record in records.items()
+                    ],
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO aggregates (scope, brands, counts, updated_at) VALUES (?, ?, ?, ?)",
+                    (
+                        scope,
+                        orjson.dumps(list(brands)),
+                        orjson.dumps(
+                            {f"{dim}\x1f{name}": row.tolist() for (dim, name), row in counts.items() if row.any()}
+                        ),
+                        now,
+                    ),
+                )
+                self._conn.commit()
+            except BaseException:
+                self._conn.rollback()
+                raise
+        return counts
+
+
+_store: Optional[PostStore] = None
+_store_lock = threading.Lock()
+
+
+def get_post_store() -> PostStore:
+    global _store
+    path = get_post_store_path()
+    with _store_lock:
+        if _store is None or _store.path != path:
+            _store = PostStore(path)
+    return _store
@@ -0,0 +1,161 @@
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+ENGAGEMENT_FIELDS = ("likes", "comments", "views", "shares")
+SENTIMENT_CLASSES = ("positive", "negative", "neutral")
+NO_SENTIMENT = -1
+
+
+def _intern(values: List[Any]) -> Tuple[np.ndarray, List[Any]]:
+    """Encode values as int codes into a vocabulary of distinct values."""
+    vocab, codes, lookup = [], np.empty(len(values), dtype=np.int32), {}
+    for i, value in enumerate(values):
+        code = lookup.get(value)
+        if code is None:
+            code = lookup[value] = len(vocab)
+            vocab.append(value)
+        codes[i] = code
+    return codes, vocab
+
+
+RELATIVE_DATE_RE = re.compile(r"(\d+)\s+(minute|hour|day|week|month|year)s?\s+ago", re.IGNORECASE)
+RELATIVE_UNITS = {"minute": 1 / 1440, "hour": 1 / 24, "day": 1, "week": 7, "month": 30, "year": 365}
+
+
+def parse_post_date(value: Any, now: Optional[datetime] = None) -> Optional[str]:
+    """
+    Best-effort ISO day for a post date: ISO timestamps (YouTube), "Jan 5,
+    2025" style dates and "3 days ago" (SerpAPI). None when unparseable.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    value = value.strip()
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).date().isoformat()
+    except ValueError:
+        pass
+    for fmt in ("%b %d, %Y", "%d %b %Y", "%B %d, %Y"):
+        try:
+            return datetime.strptime(value, fmt).date().isoformat()
+        except ValueError:
+            pass
+    match = RELATIVE_DATE_RE.search(value)
+    if match:
+        days = int(match.group(1)) * RELATIVE_UNITS[match.group(2).lower()]
+        return ((now or datetime.utcnow()) - timedelta(days=days)).date().isoformat()
+    return None
+
+
+def _to_int(value: Any) -> int:
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class PostTable:
+    """
+    Columnar view of the posts flowing through the pipeline.
+
+    Row i is posts[i]. Engagement counts live in one (n, 4) int64 matrix,
+    platform and author are interned into integer codes, the keywords that
+    found each post form an (n, n_keywords) mask, dates are a
+    datetime64[D] column (NaT when unknown), brand mentions are an
+    (n, n_brands) boolean mask and brand-scoped sentiment an
+    (n, n_brands) int8 matrix of SENTIMENT_CLASSES indices (-1 where the
+    brand isn't mentioned). Per-brand aggregates are plain reductions
+    over these arrays.
+    """
+
+    def __init__(self, posts: List[Dict[str, Any]], brands: List[str]):
+        self.posts = posts
+        self.brands = list(brands)
+        self.brand_index = {b: i for i, b in enumerate(self.brands)}
+
+        metas = [p.get("meta", {}) for p in posts]
+        self.engagement = np.array(
+            [[_to_int(m.get(f)) for f in ENGAGEMENT_FIELDS] for m in metas],
+            dtype=np.int64,
+        ).reshape(len(posts), len(ENGAGEMENT_FIELDS))
+        self.platform_codes, self.platforms = _intern([p.get("platform") for p in posts])
+        self.author_codes, self.authors = _intern([m.get("author") for m in metas])
+
+        self.keywords = list(dict.fromkeys(kw for m in metas for kw in m.get("keywords", [])))
+        keyword_index = {kw: i for i, kw in enumerate(self.keywords)}
+        self.keyword_mask = np.zeros((len(posts), len(self.keywords)), dtype=bool)
+        for row, m in enumerate(metas):
+            for kw in m.get("keywords", []):
+                self.keyword_mask[row, keyword_index[kw]] = True
+
+        self.dates = np.array(
+            [parse_post_date(m.get("date")) or "NaT" for m in metas], dtype="datetime64[D]"
+        )
+
+        self.brand_mask = np.zeros((len(posts), len(self.brands)), dtype=bool)
+        self.brand_sentiment = np.full(
+            (len(posts), len(self.brands)), NO_SENTIMENT, dtype=np.int8
+        )
+
+    def __len__(self) -> int:
+        return len(self.posts)
+
+    def set_brands(self, row: int, brands: List[str]) -> None:
+        for brand in brands:
+            col = self.brand_index.get(brand)
+            if col is not None:
+                self.brand_mask[row, col] = True
+
+    def set_brand_sentiment(self, row: int, brand: str, sentiment: str) -> None:
+        col = self.brand_index.get(brand)
+        if col is not None:
+            self.brand_sentiment[row, col] = SENTIMENT_CLASSES.index(sentiment)
+
+    def mention_counts(self) -> np.ndarray:
+        return self.brand_mask.sum(axis=0)
+
+    def engagement_totals(self) -> np.ndarray:
+        """(n_brands, 4) engagement sums over the posts mentioning each brand."""
+        return self.brand_mask.T.astype(np.int64) @ self.engagement
+
+    def sentiment_counts(self) -> np.ndarray:
+        """(n_brands, 3) counts of each sentiment class per brand."""
+        return np.stack(
+            [(self.brand_sentiment == c).sum(axis=0) for c in range(len(SENTIMENT_CLASSES))],
+            axis=1,
+        )
+
+    def mention_counters(self) -> Dict[str, int]:
+        return dict(zip(self.brands, self.mention_counts().tolist()))
+
+    def engagement_dict(self) -> Dict[str, Dict[str, int]]:
+        return {
+            brand: dict(zip(ENGAGEMENT_FIELDS, row))
+            for brand, row in zip(self.brands, self.engagement_totals().tolist())
+        }
+
+    def sentiment_dict(self) -> Dict[str, Dict[str, int]]:
+        return {
+            brand: dict(zip(SENTIMENT_CLASSES, row))
+            for brand, row in zip(self.brands, self.sentiment_counts().tolist())
+        }
+
+    @classmethod
+    def from_posts(cls, posts: List[Dict[str, Any]], brands: List[str]) -> "PostTable":
+        """Table for posts already carrying "brands" and "brand_sentiment"."""
+        table = cls(posts, brands)
+        for row, post in enumerate(posts):
+            table.set_brands(row, post.get("brands", []))
+            for brand, sentiment in post.get("brand_sentiment", {}).items():
+                table.set_brand_sentiment(row, brand, sentiment)
+        return table
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any], brands: List[str]) -> "PostTable":
+        """The table built by brand tagging, or one rebuilt from tagged posts."""
+        table = state.get("post_table")
+        if isinstance(table, cls) and table.brands == list(brands):
+            return table
+        return cls.from_posts(state.get("tagged_data", []), brands)
@@ -0,0 +1,64 @@
+import asyncio
+import contextvars
+from typing import Any, AsyncIterator, Callable, Coroutine, Dict, Optional
+
+# Where partial-result events of the current run go; unset outside streaming runs
+_sink: contextvars.ContextVar[Optional[Callable[[Dict[str, Any]], None]]] = contextvars.ContextVar(
+    "progress_sink", default=None
+)
+
+
+def source_view(post: Dict[str, Any]) -> Dict[str, Any]:
+    """Flat, standalone copy of a post for streaming to clients."""
+    meta = post.get("meta", {})
+    return {
+        "platform": post.get("platform"),
+        "text": post.get("text"),
+        **{k: meta.get(k) for k in ("url", "date", "author", "likes", "comments", "views", "shares")},
+    }
+
+
+def emit(event: Dict[str, Any]) -> None:
+    """
+    Publish a partial result from inside a node. Safe to call from worker
+    threads; a no-op when nobody is streaming the run. Events must not be
+    mutated afterwards, so pass fresh dicts.
+    """
+    sink = _sink.get()
+    if sink is not None:
+        sink(event)
+
+
+class EventStream:
+    """Collects events emitted by a node while it runs on the event loop or in threads."""
+
+    def __init__(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+
+    def _put(self, event: Dict[str, Any]) -> None:
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    def start(self, coro: Coroutine) -> asyncio.Task:
+        """Run `coro` as a task whose emit() calls land in this stream."""
+        context = contextvars.copy_context()
+        context.run(_sink.set, self._put)
+        return asyncio.create_task(coro, context=context)
+
+    async def drain(self, task: asyncio.Task) -> AsyncIterator[Dict[str, Any]]:
+        """Yield events as they arrive until `task` is done and the queue is empty."""
+        try:
+            while True:
+                getter = asyncio.ensure_future(self._queue.get())
+                done, _ = await asyncio.wait({task, getter}, return_when=asyncio.FIRST_COMPLETED)
+                if getter in done:
+                    yield getter.result()
+                    continue
+                getter.cancel()
+                # Emits are queued before the task's completion is delivered
+                while not self._queue.empty():
+                    yield self._queue.get_nowait()
+                return
+        finally:
+            if not task.done():
+                task.cancel()
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable
+
+import openai
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+from services.instrumentation import record_retry
+
+
+class TokenBucket:
+    """
+    Token bucket shared by every run in the process. `acquire()` waits
+    without blocking the event loop until a token is available, refilling
+    at `rate_per_second` up to `capacity` tokens.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: int):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_for = (1 - self._tokens) / self.rate
+            await asyncio.sleep(wait_for)
+
+
+def is_retryable_llm_error(exc: BaseException) -> bool:
+    """Rate limits, 5xx responses and connection failures are worth retrying."""
+    if isinstance(exc, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    if isinstance(exc, openai.APIStatusError):
+        return exc.status_code == 429 or exc.status_code >= 500
+    return False
+
+
+async def call_with_retry(
+    fn: Callable[..., Awaitable[Any]],
+    *args,
+    bucket: TokenBucket = None,
+    max_retries: int = 4,
+    **kwargs,
+) -> Any:
+    """
+    Await `fn`, taking a bucket token before every attempt and retrying
+    retryable LLM errors with exponential backoff and jitter.
+    """
+    name = getattr(fn, "__name__", "llm")
+
+    @retry(
+        retry=retry_if_exception(is_retryable_llm_error),
+        stop=stop_after_attempt(max_retries + 1),
+        wait=wait_exponential_jitter(initial=1, max=30),
+        reraise=True,
+        before_sleep=lambda _: record_retry(name),
+    )
+    async def _attempt():
+        if bucket is not None:
+            await bucket.acquire()
+        return await fn(*args, **kwargs)
+
+    return await _attempt()
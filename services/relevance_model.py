@@ -0,0 +1,141 @@
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from services.brand_catalog import BrandCatalog
+
+URL_RE = re.compile(r"https?://\S+|www\.\S+")
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9\-']+")
+
+
+def url_ratio(text: str) -> float:
+    """Share of characters that belong to URLs."""
+    url_chars = sum(len(m) for m in URL_RE.findall(text))
+    return url_chars / len(text) if text else 0.0
+
+
+def stem(token: str) -> str:
+    """Crude suffix stripping so "fans"/"fan's"/"fan" or "reviews"/"reviewed" share a token."""
+    if token.endswith("'s"):
+        token = token[:-2]
+    if token.endswith("ies") and len(token) > 4:
+        token = token[:-3] + "y"
+    elif token.endswith("s") and not token.endswith("ss") and len(token) > 3:
+        token = token[:-1]
+    for suffix in ("ing", "ed"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[: -len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Stemmed word tokens, URLs removed."""
+    return [stem(t) for t in TOKEN_RE.findall(URL_RE.sub(" ", text.lower()))]
+
+
+def keyword_overlap(tokens: set, keywords: List[str]) -> float:
+    """Fraction of keyword tokens that appear in the post."""
+    keyword_tokens = {t for kw in keywords for t in tokenize(kw)}
+    if not keyword_tokens:
+        return 0.0
+    return len(keyword_tokens & tokens) / len(keyword_tokens)
+
+
+class RelevanceModel:
+    """
+    Small TF-IDF + logistic regression model predicting whether the LLM
+    would keep a post (relevant and not spam). Trained with plain SGD on
+    labels from the classification cache; no extra dependencies.
+    """
+
+    def __init__(self):
+        self.weights: Dict[str, float] = {}
+        self.idf: Dict[str, float] = {}
+        self.default_idf = 1.0
+        self.trained_on = 0
+
+    def _features(self, text: str, keywords: List[str], catalog: BrandCatalog) -> Dict[str, float]:
+        counts = Counter(tokenize(text))
+        features = {
+            f"w:{tok}": (1 + math.log(n)) * self.idf.get(tok, self.default_idf)
+            for tok, n in counts.items()
+        }
+        norm = math.sqrt(sum(v * v for v in features.values())) or 1.0
+        features = {k: v / norm for k, v in features.items()}
+
+        features["bias"] = 1.0
+        features["keyword_overlap"] = keyword_overlap(set(counts), keywords)
+        features["brand_mention"] = float(bool(catalog.find(text)))
+        features["length"] = min(len(text) / 500, 1.0)
+        features["url_ratio"] = url_ratio(text)
+        return features
+
+    def fit(self, examples: List[Dict[str, Any]], catalog: BrandCatalog, epochs: int = 5, lr: float = 0.5, l2: float = 1e-4) -> None:
+        """`examples` are cached classifications carrying post, keywords, relevant and spam."""
+        doc_freq = Counter()
+        for ex in examples:
+            doc_freq.update(set(tokenize(ex["post"])))
+        n_docs = len(examples)
+        self.idf = {tok: math.log((1 + n_docs) / (1 + df)) + 1 for tok, df in doc_freq.items()}
+        self.default_idf = math.log(1 + n_docs) + 1
+
+        data = [
+            (
+                self._features(ex["post"], ex.get("keywords", []), catalog),
+                1.0 if ex["relevant"] and not ex["spam"] else 0.0,
+            )
+            for ex in examples
+        ]
+        self.weights = {}
+        for _ in range(epochs):
+            for features, label in data:
+                error = self._score(features) - label
+                for name, value in features.items():
+                    w = self.weights.get(name, 0.0)
+                    self.weights[name] = w - lr * (error * value + l2 * w)
+        self.trained_on = n_docs
+
+    def _score(self, features: Dict[str, float]) -> float:
+        z = sum(self.weights.get(name, 0.0) * value for name, value in features.items())
+        z = max(min(z, 30.0), -30.0)
+        return 1 / (1 + math.exp(-z))
+
+    def predict_keep(self, text: str, keywords: List[str], catalog: BrandCatalog) -> float:
+        return self._score(self._features(text, keywords, catalog))
+
+
+_model: Optional[RelevanceModel] = None
+_trained_at = 0.0
+_lock = threading.Lock()
+
+
+def get_relevance_model(cache, catalog: BrandCatalog, settings: Dict[str, Any]) -> Optional[RelevanceModel]:
+    """
+    Process-wide model, retrained from the classification cache at most
+    every `retrain_seconds`. Returns None until there are enough labels of
+    both classes to train on.
+    """
+    global _model, _trained_at
+    if cache is None:
+        return None
+    with _lock:
+        if _model is not None and time.time() - _trained_at < settings["retrain_seconds"]:
+            return _model
+        _trained_at = time.time()
+
+        examples = [
+            ex for ex in cache.recent(settings["max_training_labels"])
+            if "post" in ex and "keywords" in ex
+        ]
+        labels = {ex["relevant"] and not ex["spam"] for ex in examples}
+        if len(examples) < settings["min_training_labels"] or len(labels) < 2:
+            _model = None
+            return None
+
+        model = RelevanceModel()
+        model.fit(examples, catalog)
+        _model = model
+        return _model
@@ -0,0 +1,119 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import httpx
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+from config import get_google_settings, get_provider_concurrency
+from services.instrumentation import HTTP_EVENT_HOOKS
+
+GEMINI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+
+
+class ResourceRegistry:
+    """
+    Process-wide home for objects that are expensive to create and safe
+    to share: compiled graphs, a pooled async HTTP client and long-lived
+    LLM clients. Everything is created on first use, so the CLI works
+    without setup; the server warms it at startup.
+
+    Async clients hold connections bound to the event loop that opened
+    them, so those are kept per running loop.
+    """
+
+    def __init__(self):
+        # Reentrant: a factory may itself look up other resources (a graph needs its steps)
+        self._lock = threading.RLock()
+        self._resources: Dict[Hashable, Any] = {}
+        self._loop_resources: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Hashable, Any]]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Return the resource stored under `key`, building it once if missing."""
+        with self._lock:
+            if key not in self._resources:
+                self._resources[key] = factory()
+            return self._resources[key]
+
+    def _get_or_create_for_loop(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            resources = self._loop_resources.setdefault(loop, {})
+            if key not in resources:
+                resources[key] = factory()
+            return resources[key]
+
+    def limiter(self, provider: str, size: int) -> asyncio.Semaphore:
+        """Caps in-flight requests to one provider across every keyword and run on this loop."""
+        return self._get_or_create_for_loop(("limiter", provider, size), lambda: asyncio.Semaphore(size))
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        """
+        Shared keep-alive client, sized for every provider pool at once:
+        the SerpAPI limiter plus the other providers' requests. Waiting for
+        a free connection doesn't count toward the request timeout.
+        """
+        size = get_google_settings()["page_concurrency"] + get_provider_concurrency() * 4
+        return self._get_or_create_for_loop(
+            "http",
+            lambda: httpx.AsyncClient(
+                timeout=httpx.Timeout(30, pool=None),
+                limits=httpx.Limits(max_connections=size, max_keepalive_connections=size),
+                event_hooks=HTTP_EVENT_HOOKS,
+            ),
+        )
+
+    def openai(self, api_key: str, max_retries: int = 2) -> AsyncOpenAI:
+        """OpenAI client; clients are concurrency-safe and keep their own connection pool."""
+        return self._get_or_create_for_loop(
+            ("openai", api_key, max_retries),
+            lambda: AsyncOpenAI(
+                api_key=api_key,
+                max_retries=max_retries,
+                http_client=DefaultAsyncHttpxClient(event_hooks=HTTP_EVENT_HOOKS),
+            ),
+        )
+
+    def gemini(self, api_key: str, max_retries: int = 2) -> AsyncOpenAI:
+        """Gemini through its OpenAI-compatible endpoint."""
+        return self._get_or_create_for_loop(
+            ("gemini", api_key, max_retries),
+            lambda: AsyncOpenAI(
+                api_key=api_key,
+                base_url=GEMINI_BASE_URL,
+                max_retries=max_retries,
+                http_client=DefaultAsyncHttpxClient(event_hooks=HTTP_EVENT_HOOKS),
+            ),
+        )
+
+    async def aclose(self) -> None:
+        """Close the clients opened on the running loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            resources = self._loop_resources.pop(loop, {})
+        for resource in resources.values():
+            if isinstance(resource, asyncio.Semaphore):
+                continue
+            try:
+                if isinstance(resource, httpx.AsyncClient):
+                    await resource.aclose()
+                else:
+                    await resource.close()
+            except Exception as e:
+                print(f"Failed to close {type(resource).__name__}: {e}")
+
+
+_registry: Optional[ResourceRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_resources() -> ResourceRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ResourceRegistry()
+    return _registry
@@ -0,0 +1,102 @@
+import asyncio
+import re
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import orjson
+import xxhash
+
+from services.event_log import EventLog
+
+# Async generator yielding the pipeline's progress / complete / error events
+Runner = Callable[[Dict[str, Any]], AsyncIterator[Dict[str, Any]]]
+
+
+def request_key(state: Dict[str, Any]) -> str:
+    """Identity of an analysis: normalized keyword set, n and run mode."""
+    keywords = sorted({re.sub(r"\s+", " ", k).strip().lower() for k in state.get("keywords") or []})
+    return xxhash.xxh3_128_hexdigest(orjson.dumps([
+        keywords,
+        state.get("top_n_per_platform"),
+        bool(state.get("incremental")),
+    ]))
+
+
+class Flight(EventLog):
+    """One pipeline run shared by every request that asked for it."""
+
+    def __init__(self):
+        super().__init__()
+        self.task: Optional[asyncio.Task] = None
+        self.subscribers = 0
+        self.succeeded = False
+        self.finished_at: Optional[float] = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical analyses. The first request for a key starts the
+    pipeline; concurrent requests for the same key attach to its event
+    stream instead of starting their own. A successful run is replayed to
+    new requests for `ttl` seconds after it finishes. A run is cancelled
+    once every attached request has gone away.
+    """
+
+    def __init__(self, runner: Runner, ttl: float):
+        self.runner = runner
+        self.ttl = ttl
+        self._flights: Dict[str, Flight] = {}
+
+    def _sweep(self, now: float) -> None:
+        expired = [
+            key for key, flight in self._flights.items()
+            if flight.closed and now - flight.finished_at > self.ttl
+        ]
+        for key in expired:
+            del self._flights[key]
+
+    def _attach(self, state: Dict[str, Any]) -> Flight:
+        self._sweep(time.time())
+        key = request_key(state)
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = Flight()
+            flight.task = asyncio.create_task(self._run(key, flight, state))
+        flight.subscribers += 1
+        return flight
+
+    async def _run(self, key: str, flight: Flight, state: Dict[str, Any]) -> None:
+        try:
+            async for event in self.runner(dict(state)):
+                flight.publish(event)
+                if event["type"] == "complete":
+                    flight.succeeded = True
+        except asyncio.CancelledError:
+            flight.publish({"type": "cancelled"})
+        except Exception as e:
+            flight.publish({"type": "error", "message": str(e)})
+        finally:
+            flight.finished_at = time.time()
+            flight.close()
+            # Only successful results are worth reusing
+            if not flight.succeeded and self._flights.get(key) is flight:
+                del self._flights[key]
+
+    async def stream(self, state: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Progress events for this analysis, from a new or an already running pipeline."""
+        flight = self._attach(state)
+        try:
+            async for event in flight.follow():
+                yield event
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.closed:
+                flight.task.cancel()
+
+    async def result(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        """The final event ("complete", "error" or "cancelled") of this analysis."""
+        final = {"type": "error", "message": "no result"}
+        async for event in self.stream(state):
+            if event["type"] != "progress":
+                final = event
+        return final
@@ -1,62 +1,248 @@
-from typing import List, Dict, Any
-from googleapiclient.discovery import build
+import asyncio
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Dict, Any, Optional
 import os
+
+import httpx
 from langsmith import traceable
+from config import get_youtube_settings
+from services.budget import current_ledger
+from services.fetch_cache import cached_fetch, mark_incomplete
+from services.instrumentation import instrumented_call
+from services.resources import get_resources
+
+YOUTUBE_API_URL = "https://www.googleapis.com/youtube/v3"
+
+# Quota units per call, per the YouTube Data API v3 cost table
+QUOTA_COSTS = {"search": 100, "videos": 1, "commentThreads": 1}
+MAX_PAGE_SIZE = 50
+
+
+class QuotaTracker:
+    """
+    YouTube quota units spent within one quota scope, per endpoint. The
+    ceilings (per run and per day) are held by the run's budget ledger,
+    which every call is charged to.
+    """
+
+    def __init__(self):
+        self.spent = 0
+        self.by_endpoint: Dict[str, int] = {}
+        self.exhausted = False
+        self._lock = threading.Lock()
+
+    def try_spend(self, endpoint: str) -> bool:
+        """Charge the cost of one call to the ledger; False (and exhausted) if it has no room."""
+        cost = QUOTA_COSTS[endpoint]
+        ledger = current_ledger()
+        if not ledger.try_spend("youtube_units", cost):
+            with self._lock:
+                self.exhausted = True
+            ledger.note_degraded("youtube_units", "skipped")
+            mark_incomplete("budget")
+            return False
+        with self._lock:
+            self.spent += cost
+            self.by_endpoint[endpoint] = self.by_endpoint.get(endpoint, 0) + cost
+        return True
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "spent": self.spent,
+            "by_endpoint": dict(self.by_endpoint),
+            "exhausted": self.exhausted,
+        }
+
+
+_quota: contextvars.ContextVar[Optional[QuotaTracker]] = contextvars.ContextVar("youtube_quota", default=None)
+
+
+@contextmanager
+def quota_scope() -> Iterator[QuotaTracker]:
+    """Track the quota of every fetch_youtube call made inside this block."""
+    tracker = QuotaTracker()
+    token = _quota.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _quota.reset(token)
+
+
+def _current_quota() -> QuotaTracker:
+    # Calls outside a scope are still charged to (and capped by) the ledger
+    return _quota.get() or QuotaTracker()
+
+
+async def _get(endpoint: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    response = await get_resources().http.get(
+        f"{YOUTUBE_API_URL}/{endpoint}",
+        params={**params, "key": os.getenv("YOUTUBE_API_KEY")},
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def _search_video_ids(keyword: str, limit: int, paginate: bool, quota: QuotaTracker) -> List[str]:
+    """Video ids for a keyword, following nextPageToken when `paginate` is set."""
+    video_ids, page_token = [], None
+    while len(video_ids) < limit and quota.try_spend("search"):
+        params = {
+            "q": keyword,
+            "part": "snippet",
+            "type": "video",
+            "maxResults": min(limit - len(video_ids), MAX_PAGE_SIZE),  # API limit
+        }
+        if page_token:
+            params["pageToken"] = page_token
+        response = await _get("search", params)
+        video_ids += [
+            item["id"]["videoId"] for item in response.get("items", [])
+            if item.get("id", {}).get("videoId")
+        ]
+        page_token = response.get("nextPageToken")
+        if not paginate or not page_token:
+            break
+    return list(dict.fromkeys(video_ids))[:limit]
 
 
+async def _video_stats(video_ids: List[str], quota: QuotaTracker, part: str = "snippet,statistics") -> List[Dict[str, Any]]:
+    """videos.list in batches of 50 ids, fetched concurrently."""
+    batches = [video_ids[i:i+MAX_PAGE_SIZE] for i in range(0, len(video_ids), MAX_PAGE_SIZE)]
+    batches = [batch for batch in batches if quota.try_spend("videos")]
+    responses = await asyncio.gather(*(
+        _get("videos", {"id": ",".join(batch), "part": part})
+        for batch in batches
+    ))
+    return [item for response in responses for item in response.get("items", [])]
+
+
+async def _comment_threads(video_id: str, limit: int, quota: QuotaTracker) -> List[Dict[str, Any]]:
+    """Top-level comments of one video, most relevant first."""
+    comments, page_token = [], None
+    while len(comments) < limit and quota.try_spend("commentThreads"):
+        params = {
+            "videoId": video_id,
+            "part": "snippet",
+            "order": "relevance",
+            "textFormat": "plainText",
+            "maxResults": min(limit - len(comments), 100),  # API limit
+        }
+        if page_token:
+            params["pageToken"] = page_token
+        try:
+            response = await _get("commentThreads", params)
+        except httpx.HTTPStatusError as e:
+            # Comments disabled or video unavailable; skip it
+            print(f"YouTube comments unavailable for {video_id}: {e.response.status_code}")
+            break
+        comments += response.get("items", [])
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            break
+    return comments[:limit]
+
+
+def _engagement(stats: Dict[str, Any]) -> Dict[str, int]:
+    return {
+        "likes": int(stats.get("likeCount", 0)),
+        "comments": int(stats.get("commentCount", 0)),
+        "views": int(stats.get("viewCount", 0)),
+        "shares": 0,  # not exposed by API
+    }
+
+
+def _video_post(item: Dict[str, Any]) -> Dict[str, Any]:
+    snippet = item["snippet"]
+    return {
+        "platform": "YouTube",
+        "text": f"{snippet.get('title', '')} - {snippet.get('description', '')}",
+        "meta": {
+            **_engagement(item.get("statistics", {})),
+            "url": f"https://www.youtube.com/watch?v={item['id']}",
+            "date": snippet.get("publishedAt"),
+            "id": item["id"],
+            "author": snippet.get("channelTitle", ""),
+        },
+    }
+
+
+def _comment_post(thread: Dict[str, Any], video_id: str) -> Dict[str, Any]:
+    comment = thread["snippet"]["topLevelComment"]
+    snippet = comment["snippet"]
+    return {
+        "platform": "YouTube",
+        "text": snippet.get("textDisplay") or snippet.get("textOriginal", ""),
+        "meta": {
+            "likes": int(snippet.get("likeCount", 0)),
+            "comments": int(thread["snippet"].get("totalReplyCount", 0)),
+            "views": 0,
+            "shares": 0,
+            "url": f"https://www.youtube.com/watch?v={video_id}&lc={comment['id']}",
+            "date": snippet.get("publishedAt"),
+            "id": comment["id"],
+            "author": snippet.get("authorDisplayName", ""),
+            "video_id": video_id,
+            "kind": "comment",
+        },
+    }
+
+
+@cached_fetch(
+    "youtube",
+    lambda keyword, top_n_videos=20, deep=False: (keyword, top_n_videos, "deep" if deep else None),
+    budget=("youtube_units", QUOTA_COSTS["search"]),
+)
+@instrumented_call("fetch", "youtube")
 @traceable(run_type="tool", name="fetch_youtube")
-def fetch_youtube(keyword: str, top_n_videos: int = 20) -> List[Dict[str, Any]]:
+async def fetch_youtube(keyword: str, top_n_videos: int = 20, deep: bool = False) -> List[Dict[str, Any]]:
     """
     Fetch top N YouTube videos + stats for a given keyword.
     Requires YouTube Data API v3 key.
+
+    Deep mode paginates search up to YOUTUBE_DEEP_MAX_VIDEOS videos and
+    adds the top-level comments of the most viewed ones as posts of their
+    own. Every call is charged to the run's quota budget; once it is spent
+    the fetch returns what it has.
     """
-    api_key = os.getenv("YOUTUBE_API_KEY")
-    if not api_key:
+    if not os.getenv("YOUTUBE_API_KEY"):
         raise RuntimeError("Missing YOUTUBE_API_KEY in environment")
 
-    youtube = build("youtube", "v3", developerKey=api_key)
-
-    search_response = (
-        youtube.search()
-        .list(
-            q=keyword,
-            part="snippet",
-            type="video",
-            maxResults=min(top_n_videos, 50),  # API limit
-        )
-        .execute()
-    )
+    settings = get_youtube_settings()
+    quota = _current_quota()
 
-    video_ids = [item["id"]["videoId"] for item in search_response["items"]]
+    limit = max(top_n_videos, settings["deep_max_videos"]) if deep else min(top_n_videos, MAX_PAGE_SIZE)
+    video_ids = await _search_video_ids(keyword, limit, paginate=deep, quota=quota)
     if not video_ids:
         return []
 
-    stats_response = (
-        youtube.videos()
-        .list(id=",".join(video_ids), part="snippet,statistics")
-        .execute()
-    )
+    videos = await _video_stats(video_ids, quota)
+    results = [_video_post(item) for item in videos]
+    if not deep or not settings["comment_videos"]:
+        return results
+
+    top_videos = sorted(results, key=lambda p: -p["meta"]["views"])[: settings["comment_videos"]]
+    semaphore = asyncio.Semaphore(settings["comment_concurrency"])
+
+    async def _comments(video_id: str) -> List[Dict[str, Any]]:
+        async with semaphore:
+            threads = await _comment_threads(video_id, settings["comments_per_video"], quota)
+        return [_comment_post(thread, video_id) for thread in threads]
 
-    results = []
-    for item in stats_response["items"]:
-        snippet = item["snippet"]
-        stats = item.get("statistics", {})
-
-        results.append(
-            {
-                "platform": "YouTube",
-                "text": f"{snippet.get('title', '')} - {snippet.get('description', '')}",
-                "meta": {
-                    "likes": int(stats.get("likeCount", 0)),
-                    "comments": int(stats.get("commentCount", 0)),
-                    "views": int(stats.get("viewCount", 0)),
-                    "shares": 0,  # not exposed by API
-                    "url": f"https://www.youtube.com/watch?v={item['id']}",
-                    "date": snippet.get("publishedAt"),
-                    "id": item["id"],
-                    "author": snippet.get("channelTitle", ""),
-                },
-            }
-        )
-
-    return results
+    per_video = await asyncio.gather(*(_comments(p["meta"]["id"]) for p in top_videos))
+    return results + [post for comments in per_video for post in comments]
+
+
+@instrumented_call("fetch", "youtube_video_stats")
+@traceable(run_type="tool", name="fetch_youtube_video_stats")
+async def fetch_video_stats(video_ids: List[str]) -> Dict[str, Dict[str, int]]:
+    """
+    Current engagement of already-known videos: {video_id: {likes,
+    comments, views, shares}}. Costs 1 quota unit per 50 ids instead of a
+    100-unit search. Deleted or private videos are simply absent.
+    """
+    if not os.getenv("YOUTUBE_API_KEY"):
+        raise RuntimeError("Missing YOUTUBE_API_KEY in environment")
+    items = await _video_stats(list(dict.fromkeys(video_ids)), _current_quota(), part="statistics")
+    return {item["id"]: _engagement(item.get("statistics", {})) for item in items}